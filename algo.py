@@ -1,23 +1,41 @@
 from constants import LEFT, RIGHT, UP, DOWN, opposite_directions
-from helpers import get_next_point, normalize_point_cords, path_to_commands, \
-    follow_path, get_prev_location, get_command_from_points
+from helpers import path_to_commands, follow_path, get_command_from_points
 import random
-import json
 from maps import ThreatsMap, SavesMap, AttacksMap, TerritoryMovementsMap
-import time
 from routes import RoutesMaker
+from snapshot import GameSnapshot
+from world import WorldModel
+from grid import get_neighbor_table, get_step_table, GridPool, OUTSIDE
+from precompute import Precomputer
+from deadline import Deadline, DeadlineExceeded
+from metrics import metrics
 
 
 class Bot:
-    def __init__(self):
+    def __init__(self, tick_budget=None, precompute=False):
+        """
+        :param tick_budget: секунды на тик; если задано, RoutesMaker добирает время
+            перебором маршрутов с большим числом поворотов, а когда время выходит, перебор отдаёт лучший
+            из найденных маршрутов, тяжёлые bfs прерываются и ход выбирается в get_fallback_move,
+            которому нужно ещё около миллисекунды
+        :param precompute: считать следующий тик в фоне между ответом и новым состоянием,
+            фон запускает start_precompute()
+        """
+        self.tick_budget = tick_budget
+        self.precomputer = Precomputer() if precompute else None
+        self.deadline = None
         self.width = None
         self.x_cells_count = None
         self.y_cells_count = None
         self.curr_position = None
-        self.curr_territory = None
         self.have_enemies = False
         self.config = None
         self.state = None
+        self.snapshot = None
+        # территории и bfs-поля между тиками
+        self.world = None
+        # буферы карт, которые переиспользуются от тика к тику
+        self.pool = None
         self.risky_location = None
 
         self.return_commands = None
@@ -29,81 +47,150 @@ class Bot:
         self.width = config['width']
         self.x_cells_count = config['x_cells_count']
         self.y_cells_count = config['y_cells_count']
+        self.world = WorldModel(self.x_cells_count, self.y_cells_count)
+        self.pool = GridPool(self.x_cells_count, self.y_cells_count)
+        # таблицы соседей и шагов арены строятся один раз до первого тика, дальше их берут снимки
+        get_neighbor_table(self.x_cells_count, self.y_cells_count)
+        get_step_table(self.x_cells_count, self.y_cells_count)
 
     def on_tick(self, state):
-        start_time = time.time()
-        self.state = state
-        self.risky_location = None
-        self.move = None
-        self.curr_position = state['players']['i']['position']
-        self.curr_territory = state['players']['i']['territory']
-        self.have_enemies = True if len(state['players']) > 1 else False
+        """
+        :returns: command for this tick
+        """
+        with metrics.stage('tick'):
+            self.deadline = Deadline(self.tick_budget) if self.tick_budget is not None else None
+            self.state = state
+            self.snapshot = GameSnapshot(self.config, state, self.world, self.deadline, self.pool)
+            if self.precomputer:
+                with metrics.stage('precompute_wait'):
+                    self.precomputer.collect(self.world)
+            self.risky_location = None
+            self.move = None
+            self.curr_position = state['players']['i']['position']
+            self.have_enemies = True if len(state['players']) > 1 else False
+
+            moves = self.get_valid_moves()
+
+            try:
+                self.choose_move(moves)
+            except DeadlineExceeded:
+                # время тика вышло посреди расчёта, ход выбирается без тяжёлых карт
+                metrics.count('deadline_fallbacks')
+                with metrics.stage('fallback'):
+                    self.move = self.get_fallback_move(moves)
 
-        moves = self.get_valid_moves()
+        self.prev_move = self.move
+        return self.move
 
+    def choose_move(self, moves):
+        """
+        пишет ход в self.move
+        raises DeadlineExceeded, если задан tick_budget и время вышло
+        """
         if self.in_territory_bounds():
-            self.move = self.attack_attempt()
+            with metrics.stage('attack'):
+                self.move = self.attack_attempt()
             if not self.move:
-                self.move = self.leave_territory()
+                with metrics.stage('leave_territory'):
+                    self.move = self.leave_territory()
                 # если следующая локация находится вне границ территории
-                if self.risky_location:
-                    threats_map = ThreatsMap(self.config, self.state)
-                    if not threats_map.is_save_location(self.risky_location, normalize=False):
-                        moves = self.filter_dangerous_moves(moves, threats_map)
-                        self.move = None
+                if self.risky_location is not None:
+                    with metrics.stage('threats'):
+                        threats_map = ThreatsMap(self.snapshot)
+                        if not threats_map.is_save_location(self.risky_location):
+                            moves = self.filter_dangerous_moves(moves, threats_map)
+                            self.move = None
                 # попытаться сделать случайный шаг в пределах своей территории
                 if not self.move:
                     self.move = random.choice(moves) if moves else LEFT
         else:
-            self.move = self.attack_attempt()
+            with metrics.stage('attack'):
+                self.move = self.attack_attempt()
             if not self.move:
-                routes_maker = RoutesMaker(self.config, self.state, self.prev_move)
+                with metrics.stage('routes'):
+                    routes_maker = RoutesMaker(self.snapshot, self.prev_move)
 
-                next_location = routes_maker.get_next_step()
-                if next_location:
-                    self.move = get_command_from_points(normalize_point_cords(self.curr_position, self.width),
-                                                        next_location)
+                    next_location = routes_maker.get_next_step(self.deadline)
+                    if next_location is not None:
+                        self.move = get_command_from_points(self.snapshot.me.position, next_location,
+                                                            self.x_cells_count)
                 if not self.move or self.move not in moves:
-                    saves_map = SavesMap(self.config, self.state)
-                    saves_map.compute()
-                    path_to_territory = saves_map.get_path_to_territory()
-                    return_commands = path_to_commands(path_to_territory, self.curr_position, self.width)
-                    if return_commands:
-                        self.move, return_commands = follow_path(return_commands)
-                    if not self.move:
-                        self.move = self.choose_arbitrary_move(moves, saves_map)
-
-        self.prev_move = self.move
-        print(json.dumps({"command": self.move, "debug": f"time = {time.time()-start_time}"}))
+                    with metrics.stage('save_path'):
+                        saves_map = self.get_saves_map()
+                        path_to_territory = saves_map.get_path_to_territory()
+                        return_commands = path_to_commands(path_to_territory, self.snapshot.me.position,
+                                                           self.x_cells_count)
+                        if return_commands:
+                            self.move, return_commands = follow_path(return_commands)
+                        if not self.move:
+                            self.move = self.choose_arbitrary_move(moves, saves_map)
+
+    def get_fallback_move(self, moves):
+        """
+        самый дешёвый безопасный ход, когда время тика вышло:
+        на территории - шаг внутри неё или шаг наружу без врагов рядом, вне - путь SavesMap до территории
+        """
+        me = self.snapshot.me
+        if self.in_territory_bounds():
+            steps = self.snapshot.steps
+            inner_moves = [move for move in moves if steps[move][me.position] in me.territory]
+            if inner_moves:
+                return random.choice(inner_moves)
+            save_moves = self.filter_dangerous_moves(moves, ThreatsMap(self.snapshot))
+            return random.choice(save_moves or moves) if moves else LEFT
+
+        saves_map = self.get_saves_map()
+        return_commands = path_to_commands(saves_map.get_path_to_territory(), me.position, self.x_cells_count)
+        if return_commands and return_commands[0] in moves:
+            return return_commands[0]
+        return random.choice(moves) if moves else LEFT
+
+    def start_precompute(self):
+        """
+        вызывается после отправки команды, пока сервер не прислал следующий тик
+        """
+        if self.precomputer and self.snapshot is not None:
+            self.precomputer.start(self.config, self.state, self.snapshot, self.move)
+
+    def get_saves_map(self):
+        me = self.snapshot.me
+        saves_map = self.world.get_speculation('saves_map', (me.territory, me.lines, me.position))
+        if saves_map is None:
+            saves_map = SavesMap(self.snapshot)
+            saves_map.compute()
+        return saves_map
 
     def leave_territory(self):
         if not self.have_enemies:
             return
 
-        prev_location = get_prev_location(self.curr_position, self.prev_move, self.width)
+        cell = self.snapshot.me.position
+        prev_location = None
+        if self.prev_move is not None:
+            prev_location = self.snapshot.steps[opposite_directions[self.prev_move]][cell]
 
-        territory_movements_map = TerritoryMovementsMap(self.config, self.state, prev_location)
+        territory_movements_map = TerritoryMovementsMap(self.snapshot, prev_location)
         next_point = territory_movements_map.get_next_point()
+        if next_point is None:
+            return
         if next_point not in territory_movements_map.my_territory:
             self.risky_location = next_point
-        if next_point:
-            return path_to_commands([next_point], self.curr_position, self.width)[0]
+        return get_command_from_points(cell, next_point, self.x_cells_count)
 
     def attack_attempt(self):
         if not self.have_enemies:
             return
 
-        attack_map = AttacksMap(self.config, self.state)
+        attack_map = AttacksMap(self.snapshot)
         next_point = attack_map.get_next_location()
-        if next_point:
-            return path_to_commands([next_point], self.curr_position, self.width)[0]
+        if next_point is not None:
+            return get_command_from_points(self.snapshot.me.position, next_point, self.x_cells_count)
 
     def choose_arbitrary_move(self, moves, saves_map):
         moves_info = {}
+        steps, cell = self.snapshot.steps, self.snapshot.me.position
         for move in moves:
-            next_point = get_next_point(self.curr_position, move, self.width)
-            next_point = normalize_point_cords(next_point, self.width)
-            moves_info[move] = saves_map.get_distance_from_point_to_territory(next_point)
+            moves_info[move] = saves_map.get_distance_from_point_to_territory(steps[move][cell])
 
         move_chosen = False
 
@@ -115,27 +202,22 @@ class Bot:
         return move
 
     def in_territory_bounds(self):
-        return self.curr_position in self.curr_territory
+        return self.snapshot.me.position in self.snapshot.me.territory
 
     def filter_dangerous_moves(self, moves, threats_map):
         save_moves = []
+        steps, cell = self.snapshot.steps, self.snapshot.me.position
         for move in moves:
-            next_point = get_next_point(self.curr_position, move, self.width)
-            if threats_map.is_save_location(next_point):
+            if threats_map.is_save_location(steps[move][cell]):
                 save_moves.append(move)
         return save_moves
 
-    def in_arena_bounds(self, point):
-        x, y = point
-        valid_x = round(self.width / 2) - 1 < x < self.x_cells_count * self.width - round(self.width / 2) + 1
-        valid_y = round(self.width / 2) - 1 < y < self.y_cells_count * self.width - round(self.width / 2) + 1
-        return valid_x and valid_y
-
     def get_valid_moves(self):
         moves = []
         invalid_move = opposite_directions[self.prev_move] if self.prev_move else None
+        steps, cell = self.snapshot.steps, self.snapshot.me.position
         for move in [LEFT, RIGHT, UP, DOWN]:
-            if self.in_arena_bounds(get_next_point(self.curr_position, move, self.width)) and move != invalid_move:
+            if steps[move][cell] != OUTSIDE and move != invalid_move:
                 moves.append(move)
         return moves
 
@@ -0,0 +1,277 @@
+"""
+замеры каждой карты по записанным тикам
+
+    python benchmark.py record --games 4 --out corpus/        - сыграть локальные партии и записать их
+    python benchmark.py run corpus/*.rep --output new.json     - замерить стадии
+    python benchmark.py compare old.json new.json              - сравнить два замера, код 1 при регрессии
+
+стадия замеряется только на тиках, где её вызвал бы Bot.on_tick, снимок тика строится вне замера
+on_tick замеряется проигрыванием каждого файла по порядку через одного Bot, как в партии
+"""
+
+import argparse
+import glob
+import json
+import os
+import random
+import sys
+import time
+
+from algo import Bot
+from constants import opposite_directions
+from maps import ThreatsMap, SavesMap, AttacksMap, TerritoryMovementsMap
+from replay import ReplayReader, RecordingBot
+from routes import RoutesMaker
+from snapshot import GameSnapshot, MAX_TICK_COUNT
+
+PHASES = ('early', 'mid', 'late')
+# насколько p50 или p99 может вырасти, прежде чем compare сочтёт это регрессией
+REGRESSION_THRESHOLD = 0.15
+
+
+def get_phase(tick_num):
+    return PHASES[min(len(PHASES) - 1, tick_num * len(PHASES) // MAX_TICK_COUNT)]
+
+
+def load_corpus(paths):
+    """
+    returns [(config, state, prev_move)] по всем тикам всех replay-файлов
+    """
+    corpus = []
+    for path in paths:
+        reader = ReplayReader(path)
+        prev_move = None
+        for state, command in reader:
+            corpus.append((reader.config, state, prev_move))
+            prev_move = command
+        reader.close()
+    return corpus
+
+
+def bench_snapshot(config, state, prev_move):
+    GameSnapshot(config, state)
+
+
+def bench_threats(snapshot, prev_move):
+    ThreatsMap(snapshot)
+
+
+def bench_saves(snapshot, prev_move):
+    saves_map = SavesMap(snapshot)
+    saves_map.compute()
+    saves_map.get_path_to_territory()
+
+
+def bench_attacks(snapshot, prev_move):
+    AttacksMap(snapshot).get_next_location()
+
+
+def bench_territory_movements(snapshot, prev_move):
+    prev_location = None
+    if prev_move is not None:
+        prev_location = snapshot.steps[opposite_directions[prev_move]][snapshot.me.position]
+    TerritoryMovementsMap(snapshot, prev_location).get_next_point()
+
+
+def bench_routes(snapshot, prev_move):
+    RoutesMaker(snapshot, prev_move).get_next_step()
+
+
+def in_territory(snapshot):
+    return snapshot.me.position in snapshot.me.territory
+
+
+# имя -> (функция, условие по снимку, нужен ли функции снимок)
+STAGES = {
+    'snapshot': (bench_snapshot, None, False),
+    'threats': (bench_threats, lambda snapshot, prev_move: snapshot.enemies, True),
+    'saves': (bench_saves, lambda snapshot, prev_move: not in_territory(snapshot), True),
+    'attacks': (bench_attacks, lambda snapshot, prev_move: snapshot.enemies, True),
+    'territory_movements': (bench_territory_movements,
+                            lambda snapshot, prev_move: snapshot.enemies and in_territory(snapshot), True),
+    'routes': (bench_routes, lambda snapshot, prev_move: prev_move and not in_territory(snapshot), True),
+}
+# весь тик бота замеряется по партиям целиком, а не по отдельным снимкам, см. run_on_tick
+ON_TICK = 'on_tick'
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def describe(times):
+    times = sorted(times)
+    return {
+        'count': len(times),
+        'mean': 1000 * sum(times) / len(times),
+        'p50': 1000 * percentile(times, 0.5),
+        'p95': 1000 * percentile(times, 0.95),
+        'p99': 1000 * percentile(times, 0.99),
+        'max': 1000 * times[-1],
+    }
+
+
+def run_stage(stage, corpus, repeat):
+    """
+    returns phase -> секунды на каждый тик, лучшее из repeat повторов
+    """
+    function, condition, needs_snapshot = STAGES[stage]
+    times = {phase: [] for phase in PHASES}
+    for index, (config, state, prev_move) in enumerate(corpus):
+        snapshot = GameSnapshot(config, state)
+        if condition is not None and not condition(snapshot, prev_move):
+            continue
+
+        best = float('inf')
+        for _ in range(repeat):
+            # снимок хранит кэш bfs-полей, поэтому на каждый повтор он новый
+            args = (GameSnapshot(config, state), prev_move) if needs_snapshot else (config, state, prev_move)
+            random.seed(index)
+            start_time = time.perf_counter()
+            function(*args)
+            best = min(best, time.perf_counter() - start_time)
+        times[get_phase(state['tick_num'])].append(best)
+    return times
+
+
+def replay_on_tick(path):
+    """
+    returns [(номер тика, секунды на on_tick)] одного replay-файла
+    """
+    reader = ReplayReader(path)
+    bot = Bot()
+    bot.on_game_start(reader.config)
+    times = []
+    prev_move = None
+    for index, (state, command) in enumerate(reader):
+        # ход берётся из записи: следующее состояние в файле получено именно после него
+        bot.prev_move = prev_move
+        random.seed(index)
+        start_time = time.perf_counter()
+        bot.on_tick(state)
+        times.append((state['tick_num'], time.perf_counter() - start_time))
+        prev_move = command
+    reader.close()
+    return times
+
+
+def run_on_tick(paths, repeat):
+    """
+    returns phase -> секунды на каждый тик, лучшее из repeat повторов
+    каждый файл проигрывается по порядку через одного Bot, как в партии: модель мира, bfs-поля и буферы
+    переходят от тика к тику, поэтому в замер попадают и кэши между тиками
+    """
+    times = {phase: [] for phase in PHASES}
+    for path in paths:
+        best = replay_on_tick(path)
+        for _ in range(repeat - 1):
+            times_again = replay_on_tick(path)
+            best = [(tick_num, min(value, other)) for (tick_num, value), (_, other) in zip(best, times_again)]
+        for tick_num, value in best:
+            times[get_phase(tick_num)].append(value)
+    return times
+
+
+def run(paths, stages, repeat):
+    corpus = load_corpus(paths)
+    results = {'ticks': len(corpus), 'stages': {}}
+    for stage in stages:
+        times = run_on_tick(paths, repeat) if stage == ON_TICK else run_stage(stage, corpus, repeat)
+        all_times = [value for phase in PHASES for value in times[phase]]
+        if not all_times:
+            continue
+        summary = {'all': describe(all_times)}
+        for phase in PHASES:
+            if times[phase]:
+                summary[phase] = describe(times[phase])
+        results['stages'][stage] = summary
+    return results
+
+
+def compare(old, new, threshold=REGRESSION_THRESHOLD):
+    """
+    печатает изменения по стадиям
+    returns список (стадия, фаза, метрика) с ростом больше threshold
+    """
+    regressions = []
+    for stage, phases in new['stages'].items():
+        for phase, values in phases.items():
+            before = old['stages'].get(stage, {}).get(phase)
+            if before is None:
+                continue
+            changes = []
+            for metric in ('mean', 'p50', 'p99'):
+                ratio = values[metric] / before[metric] if before[metric] else 1.0
+                changes.append(f'{metric} {before[metric]:.2f} -> {values[metric]:.2f} ({100 * (ratio - 1):+.0f}%)')
+                if metric != 'mean' and ratio > 1 + threshold:
+                    regressions.append((stage, phase, metric))
+            print(f'{stage:>20} {phase:>5}: ' + ', '.join(changes))
+    return regressions
+
+
+def record(games, players, out, seed, max_tick):
+    from simulator import Game
+
+    os.makedirs(out, exist_ok=True)
+    for game in range(seed, seed + games):
+        bots = [RecordingBot(Bot(), os.path.join(out, f'game{game}_player{slot + 1}.rep')) for slot in range(players)]
+        Game(bots, seed=game, max_tick=max_tick).play()
+        for bot in bots:
+            bot.close()
+
+
+def print_results(results):
+    print(f'{results["ticks"]} ticks')
+    for stage, phases in results['stages'].items():
+        for phase, values in phases.items():
+            print(f'{stage:>20} {phase:>5}: n {values["count"]:5d} mean {values["mean"]:6.2f} p50 {values["p50"]:6.2f} '
+                  f'p95 {values["p95"]:6.2f} p99 {values["p99"]:6.2f} max {values["max"]:6.2f} ms')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='замеры каждой карты по записанным тикам')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    record_parser = commands.add_parser('record', help='записать корпус тиков локальными партиями')
+    record_parser.add_argument('--games', type=int, default=4)
+    record_parser.add_argument('--players', type=int, default=4)
+    record_parser.add_argument('--seed', type=int, default=0)
+    record_parser.add_argument('--max-tick', type=int, default=MAX_TICK_COUNT)
+    record_parser.add_argument('--out', required=True)
+
+    run_parser = commands.add_parser('run', help='замерить стадии на корпусе')
+    run_parser.add_argument('replays', nargs='+', help='replay-файлы или папки с ними')
+    run_parser.add_argument('--stage', action='append', choices=[*STAGES, ON_TICK], help='по умолчанию все')
+    run_parser.add_argument('--repeat', type=int, default=3, help='лучшее из повторов сглаживает шум')
+    run_parser.add_argument('--output', help='записать результат в json')
+
+    compare_parser = commands.add_parser('compare', help='сравнить два json с результатами')
+    compare_parser.add_argument('old')
+    compare_parser.add_argument('new')
+    compare_parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD)
+
+    args = parser.parse_args()
+    if args.command == 'record':
+        record(args.games, args.players, args.out, args.seed, args.max_tick)
+    elif args.command == 'run':
+        paths = []
+        for path in args.replays:
+            paths.extend(sorted(glob.glob(os.path.join(path, '*.rep'))) if os.path.isdir(path) else [path])
+        results = run(paths, args.stage or [*STAGES, ON_TICK], args.repeat)
+        print_results(results)
+        if args.output:
+            with open(args.output, 'w') as file:
+                json.dump(results, file, indent=2)
+    else:
+        with open(args.old) as file:
+            old = json.load(file)
+        with open(args.new) as file:
+            new = json.load(file)
+        regressions = compare(old, new, args.threshold)
+        if regressions:
+            print('regressions: ' + ', '.join('/'.join(item) for item in regressions))
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+from array import array
+from grid import Grid, UNVISITED, get_neighbor_table
+from metrics import metrics
+
+NO_PARENT = -1
+
+
+class BfsResult:
+    """
+    dist - карта дистанций от источников (UNVISITED для непосещённых клеток)
+    parents - индекс клетки, из которой пришли, NO_PARENT для источников и непосещённых
+    order - индексы посещённых клеток в порядке обхода, начиная с источников
+    reached - первая найденная целевая клетка или None
+    """
+    __slots__ = ['dist', 'parents', 'order', 'reached']
+
+    def __init__(self, dist, parents, order, reached):
+        self.dist = dist
+        self.parents = parents
+        self.order = order
+        self.reached = reached
+
+    def distance(self, cell):
+        """
+        returns None if cell was not visited
+        """
+        value = self.dist.cells[cell]
+        return None if value == UNVISITED else value
+
+    def path_to(self, cell):
+        """
+        returns path [first_step, ..., cell] without the source cell
+        пустой список, если клетка не посещена или сама является источником
+        """
+        parents = self.parents
+        if self.dist.cells[cell] == UNVISITED:
+            return []
+
+        path = []
+        while parents[cell] != NO_PARENT:
+            path.append(cell)
+            cell = parents[cell]
+
+        path.reverse()
+        return path
+
+
+def bfs(x_cells_count, y_cells_count, sources, blocked=None, max_depth=None, targets=None, all_targets=False,
+        deadline=None, pool=None):
+    """
+    bfs по клеткам арены сразу от нескольких источников
+    раскрытые клетки считаются в metrics как bfs_expanded
+
+    клетки - индексы y * x_cells_count + x, соседи обходятся в порядке get_neighbor_table
+    sources - клетки с дистанцией 0, обходятся в переданном порядке
+    blocked - Mask клеток, в которые нельзя заходить (источники не проверяются)
+    max_depth - не посещать клетки дальше этой дистанции
+    targets - Mask целевых клеток, поиск останавливается на первой найденной
+    all_targets - останавливаться только когда найдены все целевые клетки
+    источники целью не считаются, цель отмечается на карте и попадает в order, но дальше не раскрывается:
+    путь до одной цели не проходит через другую
+    deadline - Deadline, проверяется на каждом новом слое, raises DeadlineExceeded
+    pool - GridPool, из которого берутся карта и родители; результат тогда годится только до конца тика
+    """
+    size = x_cells_count * y_cells_count
+    if pool is None:
+        dist = Grid(x_cells_count, y_cells_count)
+        parents = array('i', [NO_PARENT]) * size
+    else:
+        dist = pool.grid()
+        parents = pool.index_array(NO_PARENT)
+    cells = dist.cells
+
+    queue = []
+    for index in sources:
+        if cells[index] == UNVISITED:
+            cells[index] = 0
+            queue.append(index)
+
+    blocked_cells = blocked.cells if blocked is not None else bytes(size)
+    target_cells = targets.cells if targets is not None else bytes(size)
+    targets_left = targets.count() if targets is not None and all_targets else 0
+    if max_depth is None:
+        max_depth = size
+    # без deadline граница слоя совпадает с max_depth, и в цикле остаётся одно сравнение
+    layer_limit = max_depth if deadline is None else 0
+
+    neighbor_table = get_neighbor_table(x_cells_count, y_cells_count)
+
+    head = 0
+    while head < len(queue):
+        index = queue[head]
+        head += 1
+
+        if target_cells[index] and cells[index]:
+            continue
+        step = cells[index] + 1
+        if step > layer_limit:
+            if step > max_depth:
+                break
+            deadline.check()
+            layer_limit = step
+
+        for neighbor in neighbor_table[index]:
+            if cells[neighbor] != UNVISITED:
+                continue
+
+            if blocked_cells[neighbor]:
+                continue
+
+            cells[neighbor] = step
+            parents[neighbor] = index
+
+            if target_cells[neighbor]:
+                if not all_targets:
+                    queue.append(neighbor)
+                    metrics.count('bfs_expanded', head)
+                    return BfsResult(dist, parents, queue, neighbor)
+
+                targets_left -= 1
+                if targets_left == 0:
+                    queue.append(neighbor)
+                    metrics.count('bfs_expanded', head)
+                    return BfsResult(dist, parents, queue, neighbor)
+
+            queue.append(neighbor)
+
+    metrics.count('bfs_expanded', head)
+    return BfsResult(dist, parents, queue, None)
+
@@ -0,0 +1,180 @@
+"""
+арена в виде одного длинного целого: бит y * x_cells_count + x отвечает за клетку (x, y)
+расширение на соседей делается сдвигами, поэтому заливки идут целыми словами, а не по клеткам
+"""
+
+from grid import Mask
+
+try:
+    popcount = int.bit_count
+except AttributeError:
+    def popcount(board):
+        return bin(board).count('1')
+
+
+_BIT_CHARS = bytes.maketrans(b'\x00\x01', b'01')
+_BIT_BYTES = bytes.maketrans(b'01', b'\x00\x01')
+
+
+class Bitboards:
+    """
+    маски краёв и операции над досками для арены заданного размера
+    """
+    __slots__ = ['x_cells_count', 'y_cells_count', 'full', 'left_column', 'not_left_column', 'not_right_column', 'row']
+
+    def __init__(self, x_cells_count, y_cells_count):
+        self.x_cells_count = x_cells_count
+        self.y_cells_count = y_cells_count
+        self.full = (1 << (x_cells_count * y_cells_count)) - 1
+        self.row = (1 << x_cells_count) - 1
+
+        left_column = 0
+        for y in range(y_cells_count):
+            left_column |= 1 << (y * x_cells_count)
+        self.left_column = left_column
+        self.not_left_column = self.full & ~left_column
+        self.not_right_column = self.full & ~(left_column << (x_cells_count - 1))
+
+    def from_cells(self, cells):
+        board = 0
+        for cell in cells:
+            board |= 1 << cell
+        return board
+
+    def from_mask(self, mask):
+        # байты маски превращаются в строку из 0 и 1, старший бит справа
+        return int(mask.cells.translate(_BIT_CHARS)[::-1], 2)
+
+    def to_mask(self, board):
+        mask = Mask(self.x_cells_count, self.y_cells_count)
+        mask.cells = bytearray(bin(board)[2:].zfill(len(mask.cells))[::-1].encode().translate(_BIT_BYTES))
+        return mask
+
+    def to_cells(self, board):
+        cells = []
+        while board:
+            low_bit = board & -board
+            cells.append(low_bit.bit_length() - 1)
+            board ^= low_bit
+        return cells
+
+    def rectangle(self, xmin, ymin, xmax, ymax):
+        """
+        клетки прямоугольника, границы включаются
+        """
+        if xmin > xmax or ymin > ymax:
+            return 0
+        x_count = self.x_cells_count
+        row = ((1 << (xmax - xmin + 1)) - 1) << xmin
+        # повторение строки на нужное число рядов через умножение
+        rows_count = ymax - ymin + 1
+        repeat = ((1 << (x_count * rows_count)) - 1) // ((1 << x_count) - 1)
+        return (row * repeat) << (ymin * x_count)
+
+    def is_orthogonally_convex(self, board):
+        """
+        в каждой строке и в каждом столбце клетки доски идут подряд
+        """
+        x_count = self.x_cells_count
+        for y in range(self.y_cells_count):
+            row = (board >> (y * x_count)) & self.row
+            if row:
+                row >>= (row & -row).bit_length() - 1
+                if row & (row + 1):
+                    return False
+
+        column_step = (1 << x_count) - 1
+        for x in range(x_count):
+            column = (board >> x) & self.left_column
+            if column:
+                column >>= (column & -column).bit_length() - 1
+                # подряд идущие клетки столбца - это повтор бита с шагом x_count
+                if column != ((1 << (x_count * popcount(column))) - 1) // column_step:
+                    return False
+        return True
+
+    def dilate(self, board):
+        """
+        доска вместе со всеми соседями своих клеток
+        """
+        x_count = self.x_cells_count
+        return (board |
+                ((board & self.not_right_column) << 1) |
+                ((board & self.not_left_column) >> 1) |
+                (board << x_count) |
+                (board >> x_count)) & self.full
+
+    def neighbors(self, board):
+        """
+        клетки, соседние с доской, но не входящие в неё
+        """
+        return self.dilate(board) & ~board
+
+    def flood(self, seeds, passable):
+        """
+        все клетки passable, достижимые из seeds
+        """
+        reached = seeds & passable
+        while True:
+            expanded = self.dilate(reached) & passable
+            if expanded == reached:
+                return reached
+            reached = expanded
+
+
+class BitboardStack(Bitboards):
+    """
+    несколько досок одной арены, уложенных в одно целое друг за другом
+    доска k начинается с бита k * stride, между досками остаётся пустой ряд,
+    поэтому dilate и flood работают сразу по всем доскам и не переносят клетки между ними
+    """
+    __slots__ = ['count', 'stride', 'repeat']
+
+    def __init__(self, bitboards, count):
+        self.x_cells_count = bitboards.x_cells_count
+        self.y_cells_count = bitboards.y_cells_count
+        self.count = count
+        # шаг кратен байту, чтобы доски резались из байтов без сдвигов
+        self.stride = (bitboards.x_cells_count * (bitboards.y_cells_count + 1) + 7) // 8 * 8
+        self.repeat = ((1 << (self.stride * count)) - 1) // ((1 << self.stride) - 1)
+
+        self.full = bitboards.full * self.repeat
+        self.row = bitboards.row
+        self.left_column = bitboards.left_column * self.repeat
+        self.not_left_column = bitboards.not_left_column * self.repeat
+        self.not_right_column = bitboards.not_right_column * self.repeat
+
+    def replicate(self, board):
+        """
+        одна и та же доска во всех слотах
+        """
+        return board * self.repeat
+
+    def join(self, boards):
+        stride_bytes = self.stride // 8
+        return int.from_bytes(b''.join(board.to_bytes(stride_bytes, 'little') for board in boards), 'little')
+
+    def split(self, stacked):
+        stride_bytes = self.stride // 8
+        data = stacked.to_bytes(stride_bytes * self.count, 'little')
+        return [int.from_bytes(data[i:i + stride_bytes], 'little') for i in range(0, len(data), stride_bytes)]
+
+
+_bitboards_cache = {}
+_stacks_cache = {}
+
+
+def get_bitboards(x_cells_count, y_cells_count):
+    bitboards = _bitboards_cache.get((x_cells_count, y_cells_count))
+    if bitboards is None:
+        bitboards = Bitboards(x_cells_count, y_cells_count)
+        _bitboards_cache[(x_cells_count, y_cells_count)] = bitboards
+    return bitboards
+
+
+def get_bitboard_stack(x_cells_count, y_cells_count, count):
+    stack = _stacks_cache.get((x_cells_count, y_cells_count, count))
+    if stack is None:
+        stack = BitboardStack(get_bitboards(x_cells_count, y_cells_count), count)
+        _stacks_cache[(x_cells_count, y_cells_count, count)] = stack
+    return stack
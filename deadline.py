@@ -0,0 +1,34 @@
+import time
+
+
+class DeadlineExceeded(Exception):
+    """
+    время на расчёт тика закончилось
+    """
+
+
+class Deadline:
+    """
+    момент, к которому расчёт тика должен закончиться
+    budget - секунды от начала тика, None - без ограничения
+    """
+    __slots__ = ['expires_at']
+
+    def __init__(self, budget=None, start=None):
+        if budget is None:
+            self.expires_at = float('inf')
+        else:
+            self.expires_at = (time.perf_counter() if start is None else start) + budget
+
+    def remaining(self):
+        return self.expires_at - time.perf_counter()
+
+    def expired(self):
+        return time.perf_counter() >= self.expires_at
+
+    def check(self):
+        """
+        прерывает расчёт, если время вышло
+        """
+        if time.perf_counter() >= self.expires_at:
+            raise DeadlineExceeded()
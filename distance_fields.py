@@ -0,0 +1,77 @@
+from bfs import bfs
+from ticks import tick_search
+
+
+class DistanceFields:
+    """
+    bfs-поля одного тика без целевых клеток: ключ - (источники, препятствия)
+    поля в тиках из get_ticks лежат в том же кэше со своим ключом
+    поле считается один раз до наибольшей запрошенной глубины и отдаётся всем картам
+    кэш живёт в GameSnapshot или, если есть модель мира, в WorldModel: тогда поля прошлого тика
+    доступны ещё один тик, а то, что за тик никто не спросил, выбрасывается
+    """
+    __slots__ = ['x_cells_count', 'y_cells_count', 'fields', 'previous']
+
+    def __init__(self, x_cells_count, y_cells_count):
+        self.x_cells_count = x_cells_count
+        self.y_cells_count = y_cells_count
+        # ключ -> (max_depth, BfsResult)
+        self.fields = {}
+        self.previous = {}
+
+    def next_tick(self):
+        self.previous, self.fields = self.fields, {}
+
+    def merge(self, other):
+        """
+        забирает поля, посчитанные в другом кэше, например заранее в фоне
+        """
+        for key, cached in other.fields.items():
+            self.fields.setdefault(key, cached)
+
+    def get(self, sources, blocked=None, max_depth=None, deadline=None):
+        """
+        результат bfs не глубже max_depth (None - вся карта)
+        поле может оказаться глубже запрошенного, клетки дальше max_depth вызывающий отбрасывает сам
+        результат общий: карты, которые меняют dist, должны работать с копией
+        deadline прерывает только новый расчёт, прерванное поле в кэш не попадает
+        """
+        key = (frozenset(sources), bytes(blocked.cells) if blocked is not None else None)
+        cached = self.fields.get(key)
+        if cached is None:
+            cached = self.previous.get(key)
+            if cached is not None:
+                self.fields[key] = cached
+        if cached is not None:
+            depth, result = cached
+            if depth is None or (max_depth is not None and max_depth <= depth):
+                return result
+
+        result = bfs(self.x_cells_count, self.y_cells_count, sources, blocked=blocked, max_depth=max_depth,
+                     deadline=deadline)
+        self.fields[key] = (max_depth, result)
+        return result
+
+    def get_ticks(self, groups, bonuses, max_ticks=None, deadline=None):
+        """
+        поле в тиках движка без препятствий, см. ticks.tick_search
+        groups - Pace -> клетки игроков с этой скоростью, bonuses - клетка -> тип бонуса
+        результат общий, как и в get, max_ticks None - вся карта
+        """
+        key = ('ticks', frozenset((pace, frozenset(cells)) for pace, cells in groups.items()),
+               frozenset(bonuses.items()))
+        cached = self.fields.get(key)
+        if cached is None:
+            cached = self.previous.get(key)
+            if cached is not None:
+                self.fields[key] = cached
+        if cached is not None:
+            depth, result = cached
+            if depth is None or (max_ticks is not None and max_ticks <= depth):
+                return result
+
+        sources = {pace: (cells, pace) for pace, cells in groups.items()}
+        result = tick_search(self.x_cells_count, self.y_cells_count, sources, bonuses=bonuses, max_ticks=max_ticks,
+                             deadline=deadline)
+        self.fields[key] = (max_ticks, result)
+        return result
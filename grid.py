@@ -0,0 +1,195 @@
+from array import array
+
+from constants import LEFT, RIGHT, UP, DOWN
+
+# значение непосещённой клетки, больше любой реальной дистанции
+UNVISITED = 32767
+
+# клетка за краем арены в таблицах шагов
+OUTSIDE = -1
+
+_neighbor_tables = {}
+_step_tables = {}
+
+
+def get_neighbor_table(x_cells_count, y_cells_count):
+    """
+    клетка -> соседи внутри арены в порядке (x+1, y), (x-1, y), (x, y+1), (x, y-1)
+    клетки - индексы y * x_cells_count + x, таблица - список по индексу клетки
+    одна общая таблица на размер арены, строится в Bot.on_game_start
+    """
+    table = _neighbor_tables.get((x_cells_count, y_cells_count))
+    if table is None:
+        table = []
+        for y in range(y_cells_count):
+            for x in range(x_cells_count):
+                table.append(tuple(ny * x_cells_count + nx
+                                   for nx, ny in ((x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1))
+                                   if 0 <= nx < x_cells_count and 0 <= ny < y_cells_count))
+        _neighbor_tables[x_cells_count, y_cells_count] = table
+    return table
+
+
+def get_step_table(x_cells_count, y_cells_count):
+    """
+    направление -> список по индексу клетки: соседняя клетка в этом направлении или OUTSIDE за краем арены
+    """
+    table = _step_tables.get((x_cells_count, y_cells_count))
+    if table is None:
+        table = {}
+        for direction, (dx, dy) in ((RIGHT, (1, 0)), (LEFT, (-1, 0)), (UP, (0, 1)), (DOWN, (0, -1))):
+            steps = []
+            for y in range(y_cells_count):
+                for x in range(x_cells_count):
+                    nx, ny = x + dx, y + dy
+                    inside = 0 <= nx < x_cells_count and 0 <= ny < y_cells_count
+                    steps.append(ny * x_cells_count + nx if inside else OUTSIDE)
+            table[direction] = steps
+        _step_tables[x_cells_count, y_cells_count] = table
+    return table
+
+
+class Grid:
+    """
+    int16 карта размером x_cells_count * y_cells_count в одном плоском массиве
+    клетка (x, y) хранится по индексу y * x_cells_count + x
+    """
+    __slots__ = ['x_cells_count', 'y_cells_count', 'cells']
+
+    def __init__(self, x_cells_count, y_cells_count, fill=UNVISITED):
+        self.x_cells_count = x_cells_count
+        self.y_cells_count = y_cells_count
+        self.cells = array('h', [fill]) * (x_cells_count * y_cells_count)
+
+    @classmethod
+    def from_mask(cls, mask, value, fill=UNVISITED):
+        """
+        клетки маски получают value, остальные fill
+        """
+        grid = cls.__new__(cls)
+        grid.x_cells_count = mask.x_cells_count
+        grid.y_cells_count = mask.y_cells_count
+        grid.cells = array('h', map((fill, value).__getitem__, mask.cells))
+        return grid
+
+    def __getitem__(self, cell):
+        return self.cells[cell]
+
+    def __setitem__(self, cell, value):
+        self.cells[cell] = value
+
+    def is_visited(self, cell):
+        return self.cells[cell] != UNVISITED
+
+
+class Mask:
+    """
+    булева карта клеток поверх bytearray, индексация как у Grid
+    """
+    __slots__ = ['x_cells_count', 'y_cells_count', 'cells']
+
+    def __init__(self, x_cells_count, y_cells_count, cells=()):
+        self.x_cells_count = x_cells_count
+        self.y_cells_count = y_cells_count
+        self.cells = bytearray(x_cells_count * y_cells_count)
+        for cell in cells:
+            self.cells[cell] = 1
+
+    def copy(self):
+        mask = Mask.__new__(Mask)
+        mask.x_cells_count = self.x_cells_count
+        mask.y_cells_count = self.y_cells_count
+        mask.cells = bytearray(self.cells)
+        return mask
+
+    def __contains__(self, cell):
+        return 0 <= cell < len(self.cells) and self.cells[cell] == 1
+
+    def add(self, cell):
+        self.cells[cell] = 1
+
+    def discard(self, cell):
+        self.cells[cell] = 0
+
+    def __or__(self, other):
+        # побайтовое или через длинное целое, без цикла на питоне
+        size = len(self.cells)
+        union = int.from_bytes(self.cells, 'little') | int.from_bytes(other.cells, 'little')
+        mask = Mask.__new__(Mask)
+        mask.x_cells_count = self.x_cells_count
+        mask.y_cells_count = self.y_cells_count
+        mask.cells = bytearray(union.to_bytes(size, 'little'))
+        return mask
+
+    def count(self):
+        return self.cells.count(1)
+
+
+class GridPool:
+    """
+    заранее выделенные буферы для карт и bfs одного тика, живёт в Bot всю игру
+    буфер перед выдачей заполняется одним копированием из готового образца, без цикла на питоне
+    всё выданное возвращается в пул в next_tick, поэтому буферы нельзя хранить дольше тика:
+    поля DistanceFields и расчёты в фоновом потоке берут память как обычно
+    """
+    __slots__ = ['x_cells_count', 'y_cells_count', 'grids', 'grids_used', 'indices', 'indices_used', 'templates']
+
+    def __init__(self, x_cells_count, y_cells_count):
+        self.x_cells_count = x_cells_count
+        self.y_cells_count = y_cells_count
+        self.grids = []
+        self.grids_used = 0
+        self.indices = []
+        self.indices_used = 0
+        # (тип массива, значение) -> массив на всю карту с этим значением, только для постоянных значений
+        self.templates = {}
+
+    def next_tick(self):
+        self.grids_used = 0
+        self.indices_used = 0
+
+    def template(self, typecode, fill, keep=True):
+        """
+        keep - запомнить образец; значения, которые меняются от тика к тику, копили бы образцы всю игру
+        """
+        template = self.templates.get((typecode, fill))
+        if template is None:
+            template = array(typecode, [fill]) * (self.x_cells_count * self.y_cells_count)
+            if keep:
+                self.templates[typecode, fill] = template
+        return template
+
+    def take_grid(self):
+        if self.grids_used == len(self.grids):
+            self.grids.append(Grid(self.x_cells_count, self.y_cells_count))
+        grid = self.grids[self.grids_used]
+        self.grids_used += 1
+        return grid
+
+    def grid(self, fill=UNVISITED):
+        """
+        Grid на время тика, все клетки равны fill
+        образец хранится только для UNVISITED, другие значения вроде оставшихся тиков свои на каждом тике
+        """
+        grid = self.take_grid()
+        grid.cells[:] = self.template('h', fill, keep=fill == UNVISITED)
+        return grid
+
+    def copy(self, source):
+        """
+        копия Grid на время тика
+        """
+        grid = self.take_grid()
+        grid.cells[:] = source.cells
+        return grid
+
+    def index_array(self, fill):
+        """
+        array('i') по клеткам карты на время тика, все значения равны fill
+        """
+        if self.indices_used == len(self.indices):
+            self.indices.append(array('i', self.template('i', fill)))
+        values = self.indices[self.indices_used]
+        self.indices_used += 1
+        values[:] = self.template('i', fill)
+        return values
@@ -1,4 +1,4 @@
-from constants import UP, DOWN, LEFT, RIGHT, opposite_directions
+from constants import UP, DOWN, LEFT, RIGHT
 from constants import SIDE_DIRECTIONS
 
 
@@ -12,53 +12,43 @@ def get_side_directions(direction):
     return SIDE_DIRECTIONS[direction]
 
 
-def get_prev_location(curr_position, prev_move, width, normalize=True):
-    if prev_move is None:
-        return None
+def point_to_cell(point, width, x_cells_count):
+    """
+    пиксели протокола -> индекс клетки y * x_cells_count + x, которым клетки обозначаются везде внутри бота
+    """
+    return int(point[1] / width) * x_cells_count + int(point[0] / width)
 
-    result = get_next_point(curr_position, opposite_directions[prev_move], width)
-    if normalize:
-        return normalize_point_cords(result, width)
 
-    return result
+def cell_to_pixels(cell, width, x_cells_count):
+    """
+    индекс клетки -> пиксели её центра, как в протоколе
+    """
+    y, x = divmod(cell, x_cells_count)
+    return [x * width + width // 2, y * width + width // 2]
 
 
-def get_next_point(position, move, width):
-    x, y = position
-
-    if move == UP:
-        return x, y + width
-
-    if move == DOWN:
-        return x, y - width
-
-    if move == LEFT:
-        return x - width, y
-
-    if move == RIGHT:
-        return x + width, y
-
-
-def normalize_point_cords(point, width):
-    return int(point[0] / width), int(point[1] / width)
-
-
-def path_to_commands(path, curr_position, width):
-    prev_point = normalize_point_cords(curr_position, width)
+def path_to_commands(path, curr_cell, x_cells_count):
+    """
+    path - индексы соседних клеток, начиная с шага из curr_cell
+    """
+    prev_cell = curr_cell
     commands = []
-    for point in path:
-        commands.append(get_command_from_points(prev_point, point))
-        prev_point = point
+    for cell in path:
+        commands.append(get_command_from_points(prev_cell, cell, x_cells_count))
+        prev_cell = cell
 
     return commands
 
 
-def get_command_from_points(prev_point, point):
-    if point[0] == prev_point[0] + 1:
+def get_command_from_points(prev_cell, cell, x_cells_count):
+    """
+    команда для шага между соседними клетками, заданными индексами
+    """
+    if cell == prev_cell + 1:
         return RIGHT
-    elif point[0] == prev_point[0] - 1:
+    elif cell == prev_cell - 1:
         return LEFT
-    elif point[1] == prev_point[1] + 1:
+    elif cell == prev_cell + x_cells_count:
         return UP
     else:
         return DOWN
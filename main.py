@@ -1,18 +1,53 @@
 from algo import Bot
+from replay import ReplayWriter
+from metrics import metrics
 import json
+import os
+import sys
+import time
 
-bot = Bot()
+try:
+    # orjson разбирает тик примерно вдвое быстрее, без него работает стандартный json
+    from orjson import loads
+except ImportError:
+    from json import loads
 
-while True:
-    try:
-        state = json.loads(input())
-    except EOFError:
-        break
+# PAPERIO_PRECOMPUTE=1 - считать следующий тик в фоне, пока сервер не прислал его состояние
+precompute = bool(os.environ.get('PAPERIO_PRECOMPUTE'))
+if precompute:
+    # фоновый поток держит GIL короткими отрезками, чтобы чтение тика не ждало его долго
+    sys.setswitchinterval(0.0005)
+bot = Bot(precompute=precompute)
+# запись партии включается переменной окружения с путём к файлу
+replay_path = os.environ.get('PAPERIO_REPLAY')
+recorder = ReplayWriter(replay_path) if replay_path else None
+# замеры стадий: PAPERIO_METRICS=stderr или путь к json, сводка пишется в конце игры
+metrics.configure(os.environ.get('PAPERIO_METRICS'))
+
+# строки читаются байтами из буфера stdin, без декодирования в str перед разбором
+for line in sys.stdin.buffer:
+    if not line.strip():
+        continue
+    state = loads(line)
 
     if state['type'] == 'start_game':
         bot.on_game_start(state['params'])
+        if recorder:
+            recorder.start_game(state['params'])
     elif state['type'] == 'tick':
-        bot.on_tick(state['params'])
+        start_time = time.time()
+        command = bot.on_tick(state['params'])
+        # в пайп stdout пишется блоками, без flush сервер не получит ответ и будет ждать его вечно
+        print(json.dumps({"command": command, "debug": f"time = {time.time()-start_time}"}), flush=True)
+        if recorder:
+            recorder.tick(state['params'], command)
+        bot.start_precompute()
     elif state['type'] == 'end_game':
+        if recorder:
+            recorder.end_game()
         break
 
+if recorder:
+    recorder.close()
+metrics.report()
+
@@ -1,69 +1,27 @@
-from collections import deque
-from helpers import normalize_point_cords
+from grid import Grid, Mask, UNVISITED, OUTSIDE
+from bfs import bfs
+from ticks import tick_search
+from constants import LEFT, RIGHT, UP, DOWN
+from routes import get_filling_weights
 
 
-def in_arena_bounds(point):
-    x = point[0]
-    y = point[1]
-    return 0 <= x <= 30 and 0 <= y <= 30
-
-
-def manhattan_distance(point1, point2):
-    x1, y1 = point1[0], point1[1]
-    x2, y2 = point2[0], point2[1]
+def manhattan_distance(cell1, cell2, x_cells_count):
+    y1, x1 = divmod(cell1, x_cells_count)
+    y2, x2 = divmod(cell2, x_cells_count)
     return abs(x1-x2) + abs(y1-y2)
 
 
-def min_manhattan_distance(point, locations):
+def min_manhattan_distance(cell, locations, x_cells_count):
     distances = []
     for location in locations:
-        distances.append(manhattan_distance(point, location))
+        distances.append(manhattan_distance(cell, location, x_cells_count))
 
     return min(distances)
 
 
-def get_neighbors(point):
-    x, y = point
-    return (x+1, y), (x-1, y), (x, y+1), (x, y-1)
-
-
-def initialize_map(x_count, y_count, initial_value=None):
-    new_map = [[initial_value for _ in range(x_count)] for _ in range(y_count)]
-    return new_map
-
-
-def get_path_from_map(arena, start_point, end_points):
-    """
-    возвращается по локациям с цифрами, игнорируя None
-    returns path [next_location, ..., ... territory_location]
-    """
-
-    current_location = start_point
-    path = []
-
-    while current_location not in end_points:
-
-        best_neighbor = current_location
-        for neighbor in get_neighbors(current_location):
-            if not in_arena_bounds(neighbor):
-                continue
-
-            if arena[neighbor[0]][neighbor[1]] is None:
-                continue
-
-            x, y = neighbor
-            best_x, best_y = best_neighbor
-            if arena[x][y] < arena[best_x][best_y]:
-                best_neighbor = (x, y)
-
-        path.append(best_neighbor)
-        current_location = best_neighbor
-
-    return path
-
-
 class MaxMin:
-    def __init__(self, cord_seq):
+    def __init__(self, cord_seq, x_cells_count):
+        self.x_cells_count = x_cells_count
         self.xmin = float('inf')
         self.ymin = float('inf')
         self.xmax = float('-inf')
@@ -75,116 +33,116 @@ class MaxMin:
         for cords in cord_seq:
             self.update(cords)
 
-    def update(self, point):
-        x, y = point
+    def update(self, cell):
+        y, x = divmod(cell, self.x_cells_count)
         self.xmin = min(self.xmin, x)
         self.ymin = min(self.ymin, y)
         self.xmax = max(self.xmax, x)
         self.ymax = max(self.ymax, y)
 
-    def is_in_range(self, point):
+    def is_in_range(self, cell):
         """
         updates minmax
-        :return: True if point in min_max range
+        :return: True if cell in min_max range
         """
         prev = (self.xmin, self.ymin, self.xmax, self.ymax)
-        self.update(point)
+        self.update(cell)
         new = (self.xmin, self.ymin, self.xmax, self.ymax)
         return prev == new
 
 
-class ThreatsMap:
+# окно за клеткой выхода, очки в котором достанутся закраской: клеток вглубь от территории и в каждую сторону
+EXIT_WINDOW_DEPTH = 5
+EXIT_WINDOW_SIDE = 2
+
+
+def get_exit_value(table, steps, cell, territory, x_cells_count):
     """
-    стартуя от шлейфа ищет ближайшего врага
-    если враг не найден(враги отсутствуют на карте), то n_steps_to_enemy = None
+    очки за клетки в окне за клеткой выхода cell на шаг вглубь окна, table - SummedAreaTable из get_filling_weights
+    окно лежит по другую сторону от соседней клетки территории, из нескольких окон берётся лучшее
+    очки делятся на ширину окна, чтобы их можно было складывать с шагами: окно нейтральных клеток
+    стоит столько же, сколько шагов до его дальнего края, а без деления оно перевешивало бы любые расстояния
     """
-    def __init__(self, config, state):
-        self.x_cells_count = config['x_cells_count']
-        self.y_cells_count = config['y_cells_count']
-        self.width = config['width']
+    y, x = divmod(cell, x_cells_count)
+    depth, side = EXIT_WINDOW_DEPTH - 1, EXIT_WINDOW_SIDE
+    value = 0
+    if steps[RIGHT][cell] in territory:
+        value = max(value, table.sum(x - depth, y - side, x, y + side))
+    if steps[LEFT][cell] in territory:
+        value = max(value, table.sum(x, y - side, x + depth, y + side))
+    if steps[UP][cell] in territory:
+        value = max(value, table.sum(x - side, y - depth, x + side, y))
+    if steps[DOWN][cell] in territory:
+        value = max(value, table.sum(x - side, y, x + side, y + depth))
+    return value / (2 * side + 1)
 
-        # changes inplace further
-        self.visited_points = {normalize_point_cords((x, y), self.width) for x, y in state['players']['i']['lines']}
 
-        my_position = state['players']['i']['position']
-        self.prev_location = normalize_point_cords(my_position, self.width)
+# клетки, до которых врагу меньше стольких моих шагов, опасны
+DANGER_STEPS = 4
+
 
-        self.my_territory = {normalize_point_cords((x, y), self.width) for x, y in state['players']['i']['territory']}
+class ThreatsMap:
+    """
+    стартуя от шлейфа ищет ближайшего врага
+    если враг не найден(враги отсутствуют на карте), то n_steps_to_enemy = None
+    """
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+        self.x_cells_count = snapshot.x_cells_count
+        self.y_cells_count = snapshot.y_cells_count
+        self.width = snapshot.width
 
-        self.enemy_points = set()
-        for player_id, player_info in state['players'].items():
-            if player_id != 'i':
-                x, y = player_info['position']
-                self.enemy_points.add(normalize_point_cords((x, y), self.width))
+        self.prev_location = snapshot.me.position
+        self.my_territory = snapshot.me.territory
+        self.enemy_points = snapshot.enemy_positions
 
         self.n_steps_to_enemy = None
-        self.map = initialize_map(self.x_cells_count, self.y_cells_count)
+        # тики, за которые враги дойдут до клетки, общие с RoutesMaker
+        self.map = None
+        # враг, который доходит до клетки быстрее, чем я делаю DANGER_STEPS шагов, опасен
+        self.danger_ticks = DANGER_STEPS * snapshot.my_pace.normal
 
         self.run_bfs_from_enemies()
 
     def run_bfs_from_enemies(self):
+        self.map = self.snapshot.get_enemy_ticks(max_ticks=self.danger_ticks).dist
 
-        queue = deque(self.enemy_points)
-
-        for x, y in self.enemy_points:
-            self.map[x][y] = 0
-
-        step_num = 0
-        while queue:
-            step_num += 1
-            if step_num > 5:
-                break
-            for _ in range(len(queue)):
-                point = queue.popleft()
-
-                for neighbor in get_neighbors(point):
-                    if not in_arena_bounds(neighbor):
-                        continue
-
-                    x, y = neighbor
-
-                    if self.map[x][y] is None or self.map[x][y] > step_num:
-                        self.map[x][y] = step_num
-                        queue.append((x, y))
-
-    def is_save_location(self, location, normalize=True):
-        if normalize:
-            x, y = normalize_point_cords(location, self.width)
-        else:
-            x, y = location
-
-        if (x, y) in self.my_territory:
+    def is_save_location(self, location):
+        """
+        location - клетка или OUTSIDE, за краем арены опасности нет
+        """
+        if location in self.my_territory:
             return True
 
-        if self.map[x][y] is not None and self.map[x][y] < 4:
+        if location != OUTSIDE and self.map[location] < self.danger_ticks:
             return False
         return True
 
 
 class SavesMap:
     """
-    инициализирует карту из None, координаты шлейфа(включая текущуюю координату) инициализируется None
+    инициализирует карту непосещёнными клетками, территория получает 0
     начиная с территории ищет мою текущую координату
     игнорирует локации с цифрами и шлейф (хотя шлейф и так с цифрами)
     все посещённые локации помечаются цифрами (кроме частного случая когда только вышли с территории в end_point)
 
     """
-    def __init__(self, config, state):
+    def __init__(self, snapshot):
 
-        self.x_cells_count = config['x_cells_count']
-        self.y_cells_count = config['y_cells_count']
-        self.width = config['width']
+        self.x_cells_count = snapshot.x_cells_count
+        self.y_cells_count = snapshot.y_cells_count
+        self.width = snapshot.width
+        self.pool = snapshot.pool
 
-        # changes inplace further
-        self.start_points = {normalize_point_cords((x, y), self.width) for x, y in state['players']['i']['territory']}
-        my_position = state['players']['i']['position']
-        self.end_point = normalize_point_cords(my_position, self.width)
-        self.lines = {normalize_point_cords((x, y), self.width) for x, y in state['players']['i']['lines']}
+        # соседи внутри арены по индексу клетки
+        self.neighbors = snapshot.neighbors
 
-        self.map = initialize_map(self.x_cells_count, self.y_cells_count)
+        self.start_points = snapshot.me.territory
+        self.end_point = snapshot.me.position
+        # changes inplace further
+        self.lines = set(snapshot.me.lines)
 
-        for point in self.start_points:
-            self.map[point[0]][point[1]] = 0
+        self.map = Grid.from_mask(snapshot.my_territory_mask, 0)
 
         self.path_to_territory = []
         self.n_steps_to_save = None
@@ -195,38 +153,33 @@ class SavesMap:
         should be used outside my territory
 
         """
-        queue = deque(self.start_points)
-
         if self.end_point in self.lines:
             self.lines.remove(self.end_point)
 
-        n_steps = 0
-        while queue:
-            n_steps += 1
-
-            for _ in range(len(queue)):
-                point = queue.popleft()
+        targets = Mask(self.x_cells_count, self.y_cells_count, [self.end_point])
+        blocked = Mask(self.x_cells_count, self.y_cells_count, self.lines)
 
-                for neighbor in get_neighbors(point):
-                    if not self.is_valid_location(neighbor):
-                        continue
+        # if just leaved territory, then n_steps should be at least 2, so end_point is reached via its neighbors
+        just_leaved = len(self.lines) == 0 and \
+            any(neighbor in self.start_points for neighbor in self.neighbors[self.end_point])
+        if just_leaved:
+            targets = Mask(self.x_cells_count, self.y_cells_count,
+                           [neighbor for neighbor in self.neighbors[self.end_point]
+                            if neighbor not in self.lines and neighbor not in self.start_points])
+            blocked.add(self.end_point)
 
-                    if self.map[neighbor[0]][neighbor[1]] is not None:
-                        continue
+        result = bfs(self.x_cells_count, self.y_cells_count, self.start_points, blocked=blocked, targets=targets,
+                     pool=self.pool)
+        self.map = result.dist
 
-                    self.map[neighbor[0]][neighbor[1]] = n_steps
-
-                    if neighbor == self.end_point:
-                        # if just leaved territory, then n_steps should be at least 2, so leave this step
-                        if len(self.lines) == 0 and n_steps == 1:
-                            self.map[neighbor[0]][neighbor[1]] = None
-                            continue
-                        else:
-                            self.n_steps_to_save = n_steps
-                            self.lines.add(self.end_point)
-                            return
+        if result.reached is None:
+            return
 
-                    queue.append(neighbor)
+        self.n_steps_to_save = result.dist.cells[result.reached]
+        if just_leaved:
+            self.n_steps_to_save += 1
+            self.map[self.end_point] = self.n_steps_to_save
+        self.lines.add(self.end_point)
 
     def get_shortest_distance_to_territory(self):
         """
@@ -243,27 +196,25 @@ class SavesMap:
         if self.n_steps_to_save is None:
             return []
 
-        min_max = MaxMin(self.lines)
+        min_max = MaxMin(self.lines, self.x_cells_count)
         current_location = self.end_point
         path = []
 
         while current_location not in self.start_points:
 
             best_neighbor = current_location
-            for neighbor in get_neighbors(current_location):
-                if not self.is_valid_location(neighbor):
+            for neighbor in self.neighbors[current_location]:
+                if neighbor in self.lines:
                     continue
 
-                if self.map[neighbor[0]][neighbor[1]] is None:
+                if not self.map.is_visited(neighbor):
                     continue
 
-                x, y = neighbor
-                best_x, best_y = best_neighbor
-                if self.map[x][y] < self.map[best_x][best_y]:
-                    best_neighbor = (x, y)
-                elif self.map[x][y] == self.map[best_x][best_y] and best_neighbor != current_location:
+                if self.map[neighbor] < self.map[best_neighbor]:
+                    best_neighbor = neighbor
+                elif self.map[neighbor] == self.map[best_neighbor] and best_neighbor != current_location:
                     if not min_max.is_in_range(neighbor):
-                        best_neighbor = (x,y)
+                        best_neighbor = neighbor
 
             path.append(best_neighbor)
             current_location = best_neighbor
@@ -272,74 +223,71 @@ class SavesMap:
         return path
 
     def is_valid_location(self, location):
-        return in_arena_bounds(location) and (location not in self.lines)
+        return location != OUTSIDE and location not in self.lines
 
     def get_distance_from_point_to_territory(self, start_point):
         """
         ищет локацию с цифрой, если такая отсутствует
         """
-        x, y = start_point
-
         if not self.is_valid_location(start_point):
             return None
 
-        if self.map[x][y] is not None:
-            return self.map[x][y]
-
-        queue = deque([start_point])
-        visited = {start_point}
-        n_steps = 0
+        if self.map.is_visited(start_point):
+            return self.map[start_point]
 
-        while queue:
-            n_steps += 1
-            for _ in range(len(queue)):
-                point = queue.popleft()
+        targets = Mask(self.x_cells_count, self.y_cells_count)
+        targets.cells = bytearray(map(UNVISITED.__ne__, self.map.cells))
+        blocked = Mask(self.x_cells_count, self.y_cells_count, self.lines)
 
-                for neighbor in get_neighbors(point):
-                    if not self.is_valid_location(neighbor):
-                        continue
-
-                    if neighbor in visited:
-                        continue
+        result = bfs(self.x_cells_count, self.y_cells_count, [start_point], blocked=blocked, targets=targets,
+                     pool=self.pool)
+        if result.reached is None:
+            return None
 
-                    x, y = neighbor[0], neighbor[1]
-                    if self.map[x][y] is not None:
-                        return n_steps + self.map[x][y]
+        return result.dist.cells[result.reached] + self.map.cells[result.reached]
 
-                    queue.append(neighbor)
-                    visited.add(neighbor)
 
-        return None
+# сколько лучших атак проверяется на путь домой и встречу с другими врагами
+ATTACK_CANDIDATES = 3
 
 
 class AttacksMap:
-    def __init__(self, config, state):
-        self.state = state
-        self.width = config['width']
-        self.x_cells_count = config['x_cells_count']
-        self.y_cells_count = config['y_cells_count']
-
-        my_position = state['players']['i']['position']
-        self.start_point = normalize_point_cords(my_position, self.width)
-        self.lines = {normalize_point_cords((x, y), self.width) for x, y in state['players']['i']['lines']}
-        self.territory = {normalize_point_cords((x, y), self.width) for x, y in state['players']['i']['territory']}
-
-        self.line_cords_to_id = {}
-        for player_id, player_info in state['players'].items():
-            if player_id != 'i':
-                for x, y in player_info['lines']:
-                    self.line_cords_to_id[normalize_point_cords((x, y), self.width)] = player_id
+    """
+    до шлейфов всех врагов и от всех врагов до их территорий считается по одному проходу,
+    атаки ранжируются, а путь домой и другие враги проверяются только у лучших
+    время сравнивается в тиках движка: у меня и у каждого врага своя скорость и бонусы по пути
+    """
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+        self.width = snapshot.width
+        self.x_cells_count = snapshot.x_cells_count
+        self.y_cells_count = snapshot.y_cells_count
+
+        self.start_point = snapshot.me.position
+        self.lines = snapshot.me.lines
+        self.territory = snapshot.me.territory
+
+        self.line_cords_to_id = snapshot.enemy_lines
+        self.bonuses = snapshot.bonus_map
+        self.pace = snapshot.my_pace
+
+        # результат bfs от меня до шлейфов всех врагов
+        self.to_enemy = None
+        # id врага -> ближайшая клетка его шлейфа и тики до неё
+        self.attack_points = {}
+        # id врага -> тики от его головы до его территории в обход шлейфа
+        self.enemy_save_ticks = {}
+        # (тики до шлейфа, -счёт врага, id врага) по возрастанию риска
+        self.attacks = []
 
         self.enemy_id = None
-
-        self.map = initialize_map(self.x_cells_count, self.y_cells_count)
-        self.second_map = initialize_map(self.x_cells_count, self.y_cells_count)
-
         self.nearest_attack_point = None
 
-        self.n_steps_to_enemy = None
-        self.n_steps_for_enemy_save = None
+        self.n_ticks_to_enemy = None
+        self.n_ticks_for_enemy_save = None
 
+        # результат bfs от точки атаки до моей территории
+        self.from_enemy = None
         self.n_steps_from_attack_point = None
         self.path_to_enemy = None
         self.path_from_enemy = None
@@ -347,30 +295,38 @@ class AttacksMap:
         self.final_point = None
         self.full_tail = None
 
-        self.n_steps_to_second_enemy = None
+        self.n_ticks_to_second_enemy = None
 
     def get_next_location(self):
-        #  bfs от меня до ближайшего соперника со шлейфом
-        self.compute_my_distance_to_enemy()
+        # bfs от меня до шлейфов всех соперников
+        self.compute_my_distance_to_enemies()
 
-        # если нет пути до шлейфа врага(возможно враг находится на базе)
-        if self.n_steps_to_enemy is None:
+        # если нет пути ни до одного шлейфа(возможно враги находятся на базе)
+        if not self.attack_points:
             return
 
-        self.compute_enemy_distance_to_territory()
+        self.compute_enemies_distance_to_territory()
+        self.rank_attacks()
+
+        for attack in self.attacks[:ATTACK_CANDIDATES]:
+            next_location = self.check_attack(attack)
+            if next_location is not None:
+                return next_location
 
-        if self.n_steps_for_enemy_save is not None:
-            # если противник вернётся на базу быстрее чем я проатачу или одновременно с моей атакой
-            if self.n_steps_to_enemy >= self.n_steps_for_enemy_save:
-                return
-            # если у противника короче или такой же шлейф(то лучше не лезть)
-            if len(self.lines) >= len(self.state['players'][self.enemy_id]['lines']):
-                return
+    def check_attack(self, attack):
+        """
+        returns первый шаг атаки, если после неё я успеваю домой раньше других врагов, иначе None
+        """
+        self.n_ticks_to_enemy, _, self.enemy_id = attack
+        self.nearest_attack_point = self.attack_points[self.enemy_id][0]
+        self.n_ticks_for_enemy_save = self.enemy_save_ticks.get(self.enemy_id)
+        self.from_enemy = self.final_point = self.n_steps_from_attack_point = None
+        self.path_from_enemy = self.full_tail = self.n_ticks_to_second_enemy = None
 
         self.compute_path_to_enemy()
 
         # если других врагов нет
-        if len(self.state['players']) == 2:
+        if len(self.snapshot.players) == 2:
             return self.path_to_enemy[0]
 
         self.run_bfs_from_attack_point()
@@ -384,344 +340,212 @@ class AttacksMap:
         self.compute_distance_to_second_enemy()
 
         # с учётом шага на свою территорию
-        attack_distance = len(self.path_to_enemy) + len(self.path_from_enemy)
-        if self.n_steps_to_second_enemy is not None and self.n_steps_to_second_enemy < attack_distance:
+        attack_ticks = self.pace.walk(self.path_to_enemy + self.from_enemy.path_to(self.final_point), self.bonuses)
+        if self.n_ticks_to_second_enemy is not None and self.n_ticks_to_second_enemy < attack_ticks:
             return None
 
         return self.path_to_enemy[0]
 
-    def compute_my_distance_to_enemy(self):
+    def compute_my_distance_to_enemies(self):
         """
         start_point - моя позиция
         end_points - локации шлефов врагов
-        заполняем карту цифрами (за исключением шлейфа) пока не достигнем ближайшего шлейфа противника
+        заполняем карту цифрами (за исключением шлейфа), пока не найдены все клетки шлейфов,
+        для каждого врага запоминается первая найденная клетка его шлейфа и тики на путь до неё
         """
-        queue = deque([self.start_point])
+        targets = Mask(self.x_cells_count, self.y_cells_count, self.line_cords_to_id)
+        blocked = Mask(self.x_cells_count, self.y_cells_count, self.lines)
 
-        n_steps = 0
-        while queue:
-            n_steps += 1
+        self.to_enemy = bfs(self.x_cells_count, self.y_cells_count, [self.start_point], blocked=blocked,
+                            targets=targets, all_targets=True, deadline=self.snapshot.deadline,
+                            pool=self.snapshot.pool)
 
-            for _ in range(len(queue)):
-                point = queue.popleft()
+        line_cords_to_id, attack_points = self.line_cords_to_id, self.attack_points
+        for index in self.to_enemy.order[1:]:
+            enemy_id = line_cords_to_id.get(index)
+            if enemy_id is not None and enemy_id not in attack_points:
+                attack_points[enemy_id] = (index, self.pace.walk(self.to_enemy.path_to(index), self.bonuses))
 
-                for neighbor in get_neighbors(point):
-                    if not self.is_valid_location(neighbor):
-                        continue
-
-                    if self.map[neighbor[0]][neighbor[1]] is not None:
-                        continue
-
-                    self.map[neighbor[0]][neighbor[1]] = n_steps
-
-                    if neighbor in self.line_cords_to_id:
-                        self.n_steps_to_enemy = n_steps
-                        self.nearest_attack_point = neighbor
-                        return
-
-                    queue.append(neighbor)
-
-    def compute_enemy_distance_to_territory(self):
+    def compute_enemies_distance_to_territory(self):
         """
-        считаем расстояние от текущей локации врага до его территории минуя его шлейф
-
+        считаем время от текущей локации каждого врага со шлейфом до его территории минуя его шлейф
+        все враги идут одним проходом tick_search, каждый со своей скоростью
         """
-        if self.n_steps_to_enemy is None:
-            return None
-
-        enemy_id = self.line_cords_to_id[self.nearest_attack_point]
-        self.enemy_id = enemy_id
-
-        start_point = normalize_point_cords(self.state['players'][enemy_id]['position'], self.width)
-        end_points = {normalize_point_cords((x, y), self.width) for x, y in self.state['players'][enemy_id]['territory']}
-        visited = {normalize_point_cords((x, y), self.width) for x, y in self.state['players'][enemy_id]['lines']}
-
-        if start_point in end_points:
-            self.n_steps_for_enemy_save = 0
-            return
-
-        queue = deque([start_point])
-        n_steps = 0
-
-        while queue:
-            n_steps += 1
-            for _ in range(len(queue)):
-                point = queue.popleft()
-
-                for neighbor in get_neighbors(point):
-                    if neighbor in visited:
-                        continue
-
-                    if not in_arena_bounds(neighbor):
-                        continue
-
-                    if neighbor in end_points:
-                        self.n_steps_for_enemy_save = n_steps
-                        return
-
-                    visited.add(neighbor)
-                    queue.append(neighbor)
+        sources, blocked, targets = {}, {}, {}
+        for enemy_id in self.attack_points:
+            enemy = self.snapshot.players[enemy_id]
+            sources[enemy_id] = ([enemy.position], self.snapshot.get_pace(enemy))
+            blocked[enemy_id] = Mask(self.x_cells_count, self.y_cells_count, enemy.lines)
+            targets[enemy_id] = Mask(self.x_cells_count, self.y_cells_count, enemy.territory)
+
+        result = tick_search(self.x_cells_count, self.y_cells_count, sources, bonuses=self.bonuses, blocked=blocked,
+                             targets=targets, deadline=self.snapshot.deadline)
+        self.enemy_save_ticks = result.reached
+
+    def rank_attacks(self):
+        """
+        атаки, которые враг не успевает избежать, вернувшись на базу
+        ранжируются по риску: за срезанный шлейф дают одни и те же очки, кого бы ни срезать, поэтому
+        ближняя атака выгоднее дальней, а счёт врага только разбивает равенство времени
+        """
+        my_lines_count = len(self.lines)
+        for enemy_id, (_, n_ticks_to_enemy) in self.attack_points.items():
+            enemy = self.snapshot.players[enemy_id]
+            n_ticks_for_enemy_save = self.enemy_save_ticks.get(enemy_id)
+            if n_ticks_for_enemy_save is not None:
+                # если противник вернётся на базу быстрее чем я проатачу или одновременно с моей атакой
+                if n_ticks_to_enemy >= n_ticks_for_enemy_save:
+                    continue
+                # если у противника короче или такой же шлейф(то лучше не лезть)
+                if my_lines_count >= len(enemy.lines):
+                    continue
+            self.attacks.append((n_ticks_to_enemy, -enemy.score, enemy_id))
+        self.attacks.sort(key=lambda attack: attack[:2])
 
     def get_distance_to_enemy(self):
-        return self.n_steps_to_enemy
+        return self.n_ticks_to_enemy
 
     def get_enemy_save_distance(self):
-        return self.n_steps_for_enemy_save
+        return self.n_ticks_for_enemy_save
 
     def compute_path_to_enemy(self):
-        self.map[self.start_point[0]][self.start_point[1]] = 0
-        path_to_enemy = reversed(get_path_from_map(self.map, self.nearest_attack_point,{tuple(self.start_point)}))
-        path_to_enemy = list(path_to_enemy)[1:] + [self.nearest_attack_point]
-        self.path_to_enemy = path_to_enemy
+        self.path_to_enemy = self.to_enemy.path_to(self.nearest_attack_point)
 
     def compute_path_from_enemy(self):
-        self.second_map[self.nearest_attack_point[0]][self.nearest_attack_point[1]] = 0
-        # TODO разобраться почему внутри может быть x,y = None
-        path_from_enemy = reversed(get_path_from_map(self.second_map, self.final_point, {self.nearest_attack_point}))
-        path_from_enemy = list(path_from_enemy)
-        self.path_from_enemy = path_from_enemy
-
-    def run_bfs_from_attack_point(self):
-        start_point = self.nearest_attack_point
-        invalid_points = set(self.path_to_enemy) | self.lines
-        end_points = self.territory
-
-        queue = deque([start_point])
-        n_steps = 0
-        while queue:
-            n_steps += 1
-
-            for _ in range(len(queue)):
-                point = queue.popleft()
-
-                for neighbor in get_neighbors(point):
-                    if neighbor in invalid_points or not in_arena_bounds(neighbor):
-                        continue
+        """
+        путь начинается с точки атаки и заканчивается перед клеткой территории
+        """
+        if self.final_point is None:
+            self.path_from_enemy = []
+            return
 
-                    if self.second_map[neighbor[0]][neighbor[1]] is not None:
-                        continue
+        self.path_from_enemy = [self.nearest_attack_point] + self.from_enemy.path_to(self.final_point)[:-1]
 
-                    self.second_map[neighbor[0]][neighbor[1]] = n_steps
+    def run_bfs_from_attack_point(self):
+        blocked = Mask(self.x_cells_count, self.y_cells_count, self.path_to_enemy) | \
+            Mask(self.x_cells_count, self.y_cells_count, self.lines)
+        targets = Mask(self.x_cells_count, self.y_cells_count, self.territory)
 
-                    if neighbor in end_points:
-                        self.n_steps_from_attack_point = n_steps
-                        self.final_point = neighbor
-                        return
+        self.from_enemy = bfs(self.x_cells_count, self.y_cells_count, [self.nearest_attack_point],
+                              blocked=blocked, targets=targets, deadline=self.snapshot.deadline,
+                              pool=self.snapshot.pool)
 
-                    queue.append(neighbor)
+        if self.from_enemy.reached is not None:
+            self.final_point = self.from_enemy.reached
+            self.n_steps_from_attack_point = self.from_enemy.distance(self.final_point)
 
     def compute_distance_to_second_enemy(self):
-
-        end_points = set()
-        for player_id, player_info in self.state['players'].items():
-            if player_id != 'i' and player_id != self.enemy_id:
-                x, y = player_info['position']
-                end_points.add(normalize_point_cords((x, y), width=self.width))
-
-        queue = deque(self.full_tail)
-        visited = self.full_tail
-        n_steps = 0
-        while queue:
-            n_steps += 1
-            for _ in range(len(queue)):
-                point = queue.popleft()
-
-                for neighbor in get_neighbors(point):
-                    if neighbor in visited:
-                        continue
-
-                    if not in_arena_bounds(neighbor):
-                        continue
-
-                    if neighbor in end_points:
-                        self.n_steps_to_second_enemy = n_steps
-                        return
-
-                    visited.add(neighbor)
-                    queue.append(neighbor)
+        """
+        тики, за которые остальные враги доходят до моего шлейфа вместе с путём атаки
+        """
+        sources, targets = {}, {}
+        full_tail = Mask(self.x_cells_count, self.y_cells_count, self.full_tail)
+        for enemy in self.snapshot.enemies:
+            if enemy.id != self.enemy_id:
+                sources[enemy.id] = ([enemy.position], self.snapshot.get_pace(enemy))
+                targets[enemy.id] = full_tail
+
+        result = tick_search(self.x_cells_count, self.y_cells_count, sources, bonuses=self.bonuses, targets=targets,
+                             first_target=True, deadline=self.snapshot.deadline)
+        if result.reached:
+            self.n_ticks_to_second_enemy = min(result.reached.values())
 
     def is_valid_location(self, location):
-        return in_arena_bounds(location) and (location not in self.lines)
+        return location != OUTSIDE and location not in self.lines
 
 
 class TerritoryMovementsMap:
     """
     нужно вызывать с базы если есть враги
     """
-    def __init__(self, config, state, prev_location):
+    def __init__(self, snapshot, prev_location):
         self.prev_location = prev_location
-        self.state = state
-        self.width = config['width']
-        self.x_cells_count = config['x_cells_count']
-        self.y_cells_count = config['y_cells_count']
-
-        self.my_territory = {normalize_point_cords((x, y), self.width) for x, y in state['players']['i']['territory']}
-        self.enemy_points = set()
-        self.enemy_territory = set()
-
-        my_position = state['players']['i']['position']
-        self.curr_pos = normalize_point_cords(my_position, self.width)
-
-        # карта для bfs от вражеской территории до меня и bfs от меня до границ
-        self.map = initialize_map(self.x_cells_count, self.y_cells_count)
-
-        for player_id, player_info in state['players'].items():
-            if player_id != 'i':
-                x, y = player_info['position']
-                self.enemy_points.add(normalize_point_cords((x, y), self.width))
-                for territory_point in player_info['territory']:
-                    x_ter, y_ter = normalize_point_cords(territory_point, self.width)
-                    self.map[x_ter][y_ter] = 0
-                    self.enemy_territory.add((x_ter, y_ter))
-
-        # карта для поиска ближайшего пути до лучшей точки
-        self.second_map = initialize_map(self.x_cells_count, self.y_cells_count)
-        self.bordering_points_set = set()
-        self.best_point = None
-        self.path_to_point = None
-
-    def run_bfs_from_enemy_territory(self):
-
-        queue = deque(self.enemy_territory)
+        self.snapshot = snapshot
+        self.width = snapshot.width
+        self.x_cells_count = snapshot.x_cells_count
+        self.y_cells_count = snapshot.y_cells_count
 
-        step_num = 0
-        while queue:
-            step_num += 1
-            for _ in range(len(queue)):
-                point = queue.popleft()
+        self.my_territory = snapshot.me.territory
+        self.enemy_points = snapshot.enemy_positions
+        self.enemy_territory = snapshot.enemy_territory
 
-                for neighbor in get_neighbors(point):
-                    if not in_arena_bounds(neighbor):
-                        continue
+        self.curr_pos = snapshot.me.position
 
-                    x, y = neighbor
+        # клетка, в которую нельзя вернуться
+        self.blocked = Mask(self.x_cells_count, self.y_cells_count,
+                            [prev_location] if prev_location is not None else ())
 
-                    if self.map[x][y] is None or self.map[x][y] > step_num:
-                        self.map[x][y] = step_num
-                        queue.append((x, y))
+        # результат bfs от меня, по нему строится путь до лучшей точки
+        self.from_curr_pos = None
+        self.bordering_points_set = set()
+        self.best_point = None
+        self.path_to_point = None
 
     def run_bfs_from_curr_pos(self):
         """
-        обходим пока не посетили все точки, граничащие с территорией
+        поле от меня по всей карте, из него же потом берётся путь до лучшей точки
         """
-        required_count = len(self.bordering_points_set)
-        visited_count = 0
-
-        queue = deque([self.curr_pos])
-        step_num = 0
-        visited = {self.curr_pos}
-        while queue:
-            step_num += 1
-            for _ in range(len(queue)):
-                point = queue.popleft()
-
-                for neighbor in get_neighbors(point):
-                    if not in_arena_bounds(neighbor):
-                        continue
-
-                    if neighbor == self.prev_location:
-                        continue
-
-                    if neighbor in visited:
-                        continue
-
-                    x, y = neighbor
-
-                    self.map[x][y] = self.map[x][y] + step_num if self.map[x][y] is not None else step_num
-
-                    if neighbor in self.bordering_points_set:
-                        visited_count += 1
-                        if visited_count == required_count:
-                            return
-
-                    visited.add(neighbor)
-                    queue.append(neighbor)
+        self.from_curr_pos = self.snapshot.fields.get([self.curr_pos], blocked=self.blocked,
+                                                      deadline=self.snapshot.deadline)
 
     def find_territory_borders(self):
-        locations = self.my_territory
+        # граница общая для тиков без захвата, поэтому только читается
+        self.bordering_points_set = self.snapshot.my_territory_info.borders
 
-        for point in locations:
-            for neighbor in get_neighbors(point):
-                if not in_arena_bounds(neighbor):
-                    continue
+    def get_region_table(self):
+        """
+        префиксные суммы очков за клетку: 5 за клетку врага, 1 за нейтральную, 0 за мою территорию
+        таблица зависит только от территорий, поэтому модель мира хранит её до захвата
+        """
+        snapshot = self.snapshot
+        world = snapshot.world
+        if world is None:
+            return get_filling_weights(snapshot, 0)
 
-                if neighbor not in self.my_territory:
-                    self.bordering_points_set.add(neighbor)
+        my_info, enemy_info, table = world.region_values
+        if my_info is not snapshot.my_territory_info or enemy_info is not snapshot.enemy_territory_info:
+            table = get_filling_weights(snapshot, 0)
+            world.region_values = (snapshot.my_territory_info, snapshot.enemy_territory_info, table)
+        return table
 
     def find_best_point(self):
         """
-        точка, которая прилегает к границе территории и имеет наибольший вес
+        точка, которая прилегает к границе территории и имеет наибольший вес:
+        очки в окне за ней минус шаги до неё плюс расстояние до ближайшего врага
         """
-        locations = self.bordering_points_set
-
-        max_weight = float('-inf')
-        best_point = None
-        for point in locations:
-
-            distance_to_enemy = min_manhattan_distance(point, self.enemy_points)
-            self.map[point[0]][point[1]] = -self.map[point[0]][point[1]] + distance_to_enemy
-
-            if max_weight < self.map[point[0]][point[1]]:
-                best_point = point
-                max_weight = self.map[point[0]][point[1]]
-
-        self.best_point = best_point
-
-    def run_bfs_to_best_point(self):
-        end_point = self.best_point
-        queue = deque([self.curr_pos])
-        self.second_map[self.curr_pos[0]][self.curr_pos[1]] = 0
-        n_steps = 0
-        while queue:
-            n_steps += 1
-            for _ in range(len(queue)):
-                point = queue.popleft()
-
-                for neighbor in get_neighbors(point):
-                    if not in_arena_bounds(neighbor):
-                        continue
+        table, steps, x_cells_count = self.get_region_table(), self.snapshot.steps, self.x_cells_count
+        my_territory, enemy_points = self.my_territory, self.enemy_points
+        distances = self.from_curr_pos.dist.cells
 
-                    if neighbor == self.prev_location:
-                        continue
-
-                    if self.second_map[neighbor[0]][neighbor[1]] is not None:
-                        continue
-
-                    self.second_map[neighbor[0]][neighbor[1]] = n_steps
-
-                    if neighbor == end_point:
-                        return
-
-                    queue.append(neighbor)
+        weights = [(get_exit_value(table, steps, point, my_territory, x_cells_count) - distances[point] +
+                    min_manhattan_distance(point, enemy_points, x_cells_count), point)
+                   for point in self.bordering_points_set if distances[point] != UNVISITED]
+        self.best_point = max(weights)[1] if weights else None
 
     def compute_path_to_best_point(self):
-        path_to_point = reversed(get_path_from_map(self.second_map, self.best_point, {tuple(self.curr_pos)}))
-        path_to_point = list(path_to_point)[1:] + [self.best_point]
-        self.path_to_point = path_to_point
+        # bfs до первой найденной цели раздал бы тех же родителей, что и полный
+        self.path_to_point = self.from_curr_pos.path_to(self.best_point)
 
     def get_next_point(self):
         # добавляются все соседи моей территории
         self.find_territory_borders()
 
-        # начиная от территории врагов идти с +step_num пока вся карта не заполнится
-        self.run_bfs_from_enemy_territory()
-
-        # начиная с моей локации искать граничные локации, заполняя карту +step_num
-        # можно заменить манхэтенским расстоянием
+        # шаги от меня до граничных локаций
         self.run_bfs_from_curr_pos()
 
-        # для каждой граничной локации взять с минусом вес
+        # для каждой граничной локации взять очки в окне за ней за вычетом шагов до неё,
         # прибавить расстояние до врагов и выбрать точку с максимальным весом
         self.find_best_point()
 
-        # предыдущая локация помечается как None
-        if self.best_point != self.prev_location:
-            self.run_bfs_to_best_point()
-        else:
+        # в предыдущую локацию вернуться нельзя
+        if self.best_point is None or self.best_point == self.prev_location:
             return None
 
         self.compute_path_to_best_point()
 
+        if not self.path_to_point:
+            return None
+
         return self.path_to_point[0]
 
 
@@ -0,0 +1,139 @@
+"""
+замеры стадий тика и счётчики горячих циклов
+
+по умолчанию выключены: stage() отдаёт общий пустой контекст, count() сразу выходит
+включаются через configure('stderr') или configure(путь к json), сводка пишется в report()
+"""
+
+import json
+import sys
+import time
+from collections import deque
+
+# сколько последних замеров стадии хранится для перцентилей
+WINDOW = 1000
+
+
+class Histogram:
+    """
+    корзины по степеням двойки в микросекундах: корзина k - от 2^(k-1) до 2^k мкс
+    плюс окно последних замеров для перцентилей
+    """
+    __slots__ = ['buckets', 'recent', 'count', 'total', 'max']
+
+    def __init__(self):
+        self.buckets = []
+        self.recent = deque(maxlen=WINDOW)
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def add(self, ns):
+        bucket = (ns // 1000).bit_length()
+        if bucket >= len(self.buckets):
+            self.buckets.extend([0] * (bucket + 1 - len(self.buckets)))
+        self.buckets[bucket] += 1
+        self.recent.append(ns)
+        self.count += 1
+        self.total += ns
+        self.max = max(self.max, ns)
+
+    def percentile(self, fraction):
+        values = sorted(self.recent)
+        return values[min(len(values) - 1, int(len(values) * fraction))] if values else 0
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'mean_ms': self.total / self.count / 1e6 if self.count else 0.0,
+            'p50_ms': self.percentile(0.5) / 1e6,
+            'p99_ms': self.percentile(0.99) / 1e6,
+            'max_ms': self.max / 1e6,
+            # верхняя граница корзины в мкс -> число замеров
+            'histogram_us': {1 << bucket: count for bucket, count in enumerate(self.buckets) if count},
+        }
+
+
+class _Stage:
+    __slots__ = ['metrics', 'name', 'start']
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.metrics.record(self.name, time.perf_counter_ns() - self.start)
+
+
+class _NullStage:
+    __slots__ = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return None
+
+
+_NULL_STAGE = _NullStage()
+
+
+class Metrics:
+    def __init__(self):
+        self.enabled = False
+        # None - stderr, иначе путь к json
+        self.path = None
+        self.stages = {}
+        self.counters = {}
+
+    def configure(self, destination):
+        """
+        destination: None или '' - выключить, 'stderr' - текстом в stderr, иначе путь к json
+        """
+        self.enabled = bool(destination)
+        self.path = None if destination in (None, '', 'stderr') else destination
+
+    def stage(self, name):
+        if not self.enabled:
+            return _NULL_STAGE
+        return _Stage(self, name)
+
+    def record(self, name, ns):
+        histogram = self.stages.get(name)
+        if histogram is None:
+            histogram = self.stages[name] = Histogram()
+        histogram.add(ns)
+
+    def count(self, name, value=1):
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def summary(self):
+        return {
+            'stages': {name: histogram.summary() for name, histogram in self.stages.items()},
+            'counters': dict(self.counters),
+        }
+
+    def report(self):
+        if not self.enabled:
+            return
+
+        summary = self.summary()
+        if self.path is not None:
+            with open(self.path, 'w') as file:
+                json.dump(summary, file, indent=2)
+            return
+
+        for name, stage in summary['stages'].items():
+            print(f'{name:>16}: n {stage["count"]:6d} mean {stage["mean_ms"]:7.2f} p50 {stage["p50_ms"]:7.2f} '
+                  f'p99 {stage["p99_ms"]:7.2f} max {stage["max_ms"]:7.2f} ms', file=sys.stderr)
+        for name, value in summary['counters'].items():
+            print(f'{name:>16}: {value}', file=sys.stderr)
+
+
+# общий экземпляр на процесс, его читают bfs и RoutesMaker
+metrics = Metrics()
@@ -0,0 +1,150 @@
+"""
+упреждающий расчёт следующего тика в фоновом потоке, пока бот ждёт состояние от сервера
+
+после хода следующая клетка известна, из неё собирается предсказанный тик: враги стоят на месте,
+мой шлейф продлён на клетку, а при возврате на территорию она уже с захватом
+для него заранее считаются производные территории, bfs-поле от моей позиции для TerritoryMovementsMap,
+SavesMap и таблица очков закраски для RoutesMaker
+
+результаты попадают в WorldModel и берутся только при точном совпадении входных данных с настоящим тиком,
+поэтому от фонового расчёта зависит только время тика, но не ход
+"""
+
+import threading
+
+from bitboard import get_bitboards
+from grid import Mask, OUTSIDE
+from helpers import cell_to_pixels
+from maps import SavesMap
+from routes import get_filling_weights
+from snapshot import GameSnapshot
+
+class PrecomputeCancelled(Exception):
+    pass
+
+
+def predict_capture(x_cells_count, y_cells_count, territory, lines):
+    """
+    territory после возврата на базу со шлейфом lines: всё, что не достаётся заливкой от краёв карты
+    """
+    bitboards = get_bitboards(x_cells_count, y_cells_count)
+    blocked = bitboards.from_cells(territory) | bitboards.from_cells(lines)
+    edges = bitboards.full & ~bitboards.rectangle(1, 1, x_cells_count - 2, y_cells_count - 2)
+    outside = bitboards.flood(edges & ~blocked, bitboards.full & ~blocked)
+    return bitboards.to_cells(bitboards.full & ~outside)
+
+
+def predict_state(config, state, snapshot, move):
+    """
+    returns (состояние следующего тика в формате протокола, следующая клетка) или None, если хода нет
+    или следующая клетка за краем карты
+    """
+    if move not in snapshot.steps:
+        return None
+
+    width = config['width']
+    me = snapshot.me
+    next_cell = snapshot.steps[move][me.position]
+    if next_cell == OUTSIDE:
+        return None
+
+    def to_pixels(cell):
+        return cell_to_pixels(cell, width, snapshot.x_cells_count)
+
+    my_info = dict(state['players']['i'])
+    my_info['position'] = to_pixels(next_cell)
+    if next_cell in me.territory:
+        if me.lines:
+            captured = predict_capture(snapshot.x_cells_count, snapshot.y_cells_count, me.territory, me.lines)
+            my_info['territory'] = [to_pixels(cell) for cell in captured]
+        my_info['lines'] = []
+    else:
+        my_info['lines'] = list(me.raw_lines) + [my_info['position']]
+
+    players = dict(state['players'])
+    players['i'] = my_info
+    ticks_per_cell = width // config['speed']
+    return dict(state, players=players, tick_num=state['tick_num'] + ticks_per_cell), next_cell
+
+
+class Precomputer:
+    """
+    start() после отправки команды, collect() в начале следующего тика
+    фоновый поток только читает снимок прошлого тика и пишет в свой предсказанный снимок,
+    в WorldModel результаты переносит collect() из основного потока
+    """
+    def __init__(self):
+        self.thread = None
+        self.cancelled = False
+        # (имя, ключ, значение) для WorldModel.put_speculation
+        self.speculations = []
+        self.fields = None
+
+    def start(self, config, state, snapshot, move):
+        self.cancelled = False
+        self.speculations = []
+        self.fields = None
+        self.thread = threading.Thread(target=self.run, args=(config, state, snapshot, move), daemon=True)
+        self.thread.start()
+
+    def collect(self, world):
+        """
+        останавливает фоновый расчёт после текущего шага и переносит готовое в world
+        вызывается после создания снимка тика, то есть после WorldModel.next_tick
+        """
+        if self.thread is None:
+            return
+        self.cancelled = True
+        self.thread.join()
+        self.thread = None
+
+        for name, key, value in self.speculations:
+            world.put_speculation(name, key, value)
+        if self.fields is not None:
+            world.fields.merge(self.fields)
+
+    def check(self):
+        if self.cancelled:
+            raise PrecomputeCancelled()
+
+    def run(self, config, state, snapshot, move):
+        try:
+            self.precompute(config, state, snapshot, move)
+        except PrecomputeCancelled:
+            pass
+
+    def precompute(self, config, state, snapshot, move):
+        prediction = predict_state(config, state, snapshot, move)
+        if prediction is None:
+            return
+        predicted_state, next_cell = prediction
+        predicted = GameSnapshot(config, predicted_state)
+        me = predicted.me
+        x_cells_count, y_cells_count = predicted.x_cells_count, predicted.y_cells_count
+
+        territory_info = predicted.my_territory_info
+        if me.territory != snapshot.me.territory:
+            # после захвата всё, что выводится из территории, считается заново
+            for name in ('board', 'borders', 'x_set', 'y_set', 'bounds', 'is_convex'):
+                getattr(territory_info, name)
+                self.check()
+            self.speculations.append((('territory', 'i'), me.territory, territory_info))
+
+        if next_cell in me.territory:
+            # поле от меня для TerritoryMovementsMap: вернуться в текущую клетку нельзя
+            if predicted.enemies:
+                blocked = Mask(x_cells_count, y_cells_count, [snapshot.me.position])
+                predicted.fields.get([next_cell], blocked=blocked)
+                self.fields = predicted.fields
+            return
+
+        saves_map = SavesMap(predicted)
+        saves_map.compute()
+        self.check()
+        self.speculations.append(('saves_map', (me.territory, me.lines, me.position), saves_map))
+
+        bitboards = get_bitboards(x_cells_count, y_cells_count)
+        lines_board = bitboards.from_cells(me.lines) | bitboards.from_cells([me.position])
+        filling_weights = get_filling_weights(predicted, lines_board)
+        self.speculations.append(('filling_weights', (me.territory, predicted.enemy_territory, lines_board),
+                                  filling_weights))
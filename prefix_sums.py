@@ -0,0 +1,38 @@
+from array import array
+from itertools import accumulate
+from operator import add
+
+
+class SummedAreaTable:
+    """
+    двумерные префиксные суммы: сумма по любому прямоугольнику за O(1)
+    values - плоский список весов клеток, индекс y * x_cells_count + x
+    """
+    __slots__ = ['x_cells_count', 'y_cells_count', 'sums']
+
+    def __init__(self, x_cells_count, y_cells_count, values):
+        self.x_cells_count = x_cells_count
+        self.y_cells_count = y_cells_count
+
+        # таблица с запасом в одну строку и один столбец нулей
+        sums = array('l', [0]) * (x_cells_count + 1)
+        prev_row = [0] * x_cells_count
+        for row_start in range(0, x_cells_count * y_cells_count, x_cells_count):
+            # префиксы строки плюс та же колонка предыдущей строки таблицы
+            prev_row = list(map(add, prev_row, accumulate(values[row_start:row_start + x_cells_count])))
+            sums.append(0)
+            sums.extend(prev_row)
+        self.sums = sums
+
+    def sum(self, xmin, ymin, xmax, ymax):
+        """
+        сумма по прямоугольнику, границы включаются и обрезаются по арене
+        """
+        xmin, ymin = max(xmin, 0), max(ymin, 0)
+        xmax, ymax = min(xmax, self.x_cells_count - 1), min(ymax, self.y_cells_count - 1)
+        if xmin > xmax or ymin > ymax:
+            return 0
+
+        sums, stride = self.sums, self.x_cells_count + 1
+        top, bottom = (ymax + 1) * stride, ymin * stride
+        return sums[top + xmax + 1] - sums[bottom + xmax + 1] - sums[top + xmin] + sums[bottom + xmin]
@@ -0,0 +1,320 @@
+"""
+компактная бинарная запись партии и чтение через mmap с доступом к любому тику
+
+файл: MAGIC, длина и json параметров start_game, затем записи тиков, в конце индекс смещений
+запись: u32 длина, u8 вид (тик или end_game), дальше для тика:
+    u16 tick_num, u8 команда, u8 ключевой кадр, u8 игроков, u8 бонусов на карте
+    бонусы: (u8 тип, u16 клетка)
+    игрок: u8 id ('i' = 0), i16 x, i16 y в пикселях, u8 направление, i32 очки, u8 бонусов, (u8 тип, u16 тиков),
+           территория: u16 добавлено, u16 убрано, индексы клеток
+           шлейф: u16 сколько клеток оставлено от прошлого тика, u16 новых, индексы клеток
+клетки хранятся индексом y * x_cells_count + x; территория и шлейф пишутся разницей с предыдущим тиком,
+а в каждом KEYFRAME_INTERVAL-м тике целиком, чтобы чтение любого тика не требовало проходить всю партию
+"""
+
+import json
+import mmap
+import struct
+import sys
+from array import array
+
+from constants import LEFT, RIGHT, UP, DOWN
+from helpers import point_to_cell, cell_to_pixels
+
+MAGIC = b'PIOR\x01'
+FOOTER_MAGIC = b'PIOI'
+KEYFRAME_INTERVAL = 64
+
+TICK_RECORD = 0
+END_RECORD = 1
+
+NO_VALUE = 255
+DIRECTIONS = (LEFT, RIGHT, UP, DOWN)
+BONUS_TYPES = ('n', 's', 'saw')
+
+_record_header = struct.Struct('<IB')
+_tick_header = struct.Struct('<HBBBB')
+_bonus = struct.Struct('<BH')
+_player_header = struct.Struct('<BhhBiB')
+_player_bonus = struct.Struct('<BH')
+_counts = struct.Struct('<HH')
+# смещение индекса, число записей, FOOTER_MAGIC
+_footer = struct.Struct('<QI4s')
+
+
+def _to_bytes(typecode, values):
+    # в файле всегда little-endian
+    data = array(typecode, values)
+    if sys.byteorder == 'big':
+        data.byteswap()
+    return data.tobytes()
+
+
+def _from_bytes(typecode, buffer, offset, count):
+    data = array(typecode)
+    data.frombytes(buffer[offset:offset + data.itemsize * count])
+    if sys.byteorder == 'big':
+        data.byteswap()
+    return data
+
+
+def _cells_to_bytes(cells):
+    return _to_bytes('H', cells)
+
+
+def _cells_from_bytes(buffer, offset, count):
+    return _from_bytes('H', buffer, offset, count)
+
+
+def _encode_code(values, value):
+    return NO_VALUE if value is None else values.index(value)
+
+
+def _decode_code(values, code):
+    return None if code == NO_VALUE else values[code]
+
+
+class ReplayWriter:
+    """
+    пишет партию по мере игры: start_game, затем tick на каждый тик, end_game в конце
+    """
+    def __init__(self, path):
+        self.file = open(path, 'wb')
+        self.file.write(MAGIC)
+        self.width = None
+        self.x_cells_count = None
+        self.offsets = []
+        # id игрока -> (территория, шлейф) прошлого тика в индексах клеток
+        self.previous = {}
+
+    def start_game(self, params):
+        self.width = params['width']
+        self.x_cells_count = params['x_cells_count']
+        config = json.dumps(params).encode()
+        self.file.write(struct.pack('<I', len(config)) + config)
+
+    def tick(self, params, command):
+        keyframe = len(self.offsets) % KEYFRAME_INTERVAL == 0
+        players = params['players']
+        bonuses = params.get('bonuses', ())
+        width, x_cells_count = self.width, self.x_cells_count
+
+        parts = [_tick_header.pack(params['tick_num'], _encode_code(DIRECTIONS, command), keyframe,
+                                   len(players), len(bonuses))]
+        for bonus in bonuses:
+            parts.append(_bonus.pack(BONUS_TYPES.index(bonus['type']), point_to_cell(bonus['position'], width, x_cells_count)))
+
+        current = {}
+        for player_id, info in players.items():
+            territory = {point_to_cell(point, width, x_cells_count) for point in info['territory']}
+            lines = [point_to_cell(point, width, x_cells_count) for point in info['lines']]
+            current[player_id] = (territory, lines)
+
+            player_bonuses = info.get('bonuses', ())
+            x, y = info['position']
+            parts.append(_player_header.pack(0 if player_id == 'i' else int(player_id), x, y,
+                                             _encode_code(DIRECTIONS, info.get('direction')),
+                                             info.get('score', 0), len(player_bonuses)))
+            for bonus in player_bonuses:
+                parts.append(_player_bonus.pack(BONUS_TYPES.index(bonus['type']), bonus.get('ticks', 0)))
+
+            previous_territory, previous_lines = (set(), []) if keyframe else self.previous.get(player_id, (set(), []))
+            added = sorted(territory - previous_territory)
+            removed = sorted(previous_territory - territory)
+            parts.append(_counts.pack(len(added), len(removed)))
+            parts.append(_cells_to_bytes(added))
+            parts.append(_cells_to_bytes(removed))
+
+            # шлейф либо дорастает на клетки, либо сбрасывается после захвата
+            kept = len(previous_lines) if lines[:len(previous_lines)] == previous_lines else 0
+            parts.append(_counts.pack(kept, len(lines) - kept))
+            parts.append(_cells_to_bytes(lines[kept:]))
+
+        self.previous = current
+        self.write_record(TICK_RECORD, b''.join(parts))
+
+    def end_game(self):
+        self.write_record(END_RECORD, b'')
+
+    def write_record(self, kind, payload):
+        if kind == TICK_RECORD:
+            self.offsets.append(self.file.tell())
+        self.file.write(_record_header.pack(len(payload), kind) + payload)
+
+    def close(self):
+        if self.file.closed:
+            return
+        index_offset = self.file.tell()
+        self.file.write(_to_bytes('Q', self.offsets))
+        self.file.write(_footer.pack(index_offset, len(self.offsets), FOOTER_MAGIC))
+        self.file.close()
+
+
+class PlayerRecord:
+    __slots__ = ['id', 'position', 'direction', 'score', 'bonuses', 'territory', 'lines']
+
+
+class ReplayReader:
+    """
+    файл отображается в память, тики читаются в любом порядке: reader[k] -> (state, command)
+    state в формате протокола; порядок клеток территории не сохраняется, порядок шлейфа сохраняется
+    если партия оборвалась и индекса в конце нет, смещения собираются одним проходом по записям
+    """
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        self.buffer = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.buffer[:len(MAGIC)] != MAGIC:
+            raise ValueError(f'{path} is not a replay file')
+
+        config_size, = struct.unpack_from('<I', self.buffer, len(MAGIC))
+        config_start = len(MAGIC) + 4
+        self.config = json.loads(self.buffer[config_start:config_start + config_size])
+        self.width = self.config['width']
+        self.x_cells_count = self.config['x_cells_count']
+        self.records_start = config_start + config_size
+
+        self.offsets = self.read_index()
+        # последний восстановленный тик, чтобы чтение подряд не возвращалось к ключевому кадру
+        self.cursor = None
+        self.players = {}
+
+    def read_index(self):
+        buffer = self.buffer
+        if len(buffer) >= self.records_start + _footer.size:
+            index_offset, count, magic = _footer.unpack_from(buffer, len(buffer) - _footer.size)
+            if magic == FOOTER_MAGIC:
+                return _from_bytes('Q', buffer, index_offset, count)
+
+        offsets = array('Q')
+        position = self.records_start
+        while position + _record_header.size <= len(buffer):
+            size, kind = _record_header.unpack_from(buffer, position)
+            if position + _record_header.size + size > len(buffer):
+                break
+            if kind == TICK_RECORD:
+                offsets.append(position)
+            position += _record_header.size + size
+        return offsets
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self.offsets)
+        if not 0 <= index < len(self.offsets):
+            raise IndexError(index)
+
+        if self.cursor is None or not (index - index % KEYFRAME_INTERVAL <= self.cursor < index):
+            start = index - index % KEYFRAME_INTERVAL
+            self.players = {}
+        else:
+            start = self.cursor + 1
+
+        for position in range(start, index + 1):
+            tick_num, command, bonuses = self.apply_record(self.offsets[position])
+        self.cursor = index
+        return self.build_state(tick_num, bonuses), command
+
+    def __iter__(self):
+        for index in range(len(self.offsets)):
+            yield self[index]
+
+    def apply_record(self, offset):
+        buffer = self.buffer
+        position = offset + _record_header.size
+        tick_num, command, keyframe, players_count, bonuses_count = _tick_header.unpack_from(buffer, position)
+        position += _tick_header.size
+
+        bonuses = []
+        for _ in range(bonuses_count):
+            bonus_type, cell = _bonus.unpack_from(buffer, position)
+            position += _bonus.size
+            bonuses.append((BONUS_TYPES[bonus_type], cell))
+
+        players = {}
+        for _ in range(players_count):
+            player_id, x, y, direction, score, player_bonuses_count = _player_header.unpack_from(buffer, position)
+            position += _player_header.size
+            player_id = 'i' if player_id == 0 else str(player_id)
+
+            previous = self.players.get(player_id)
+            player = PlayerRecord()
+            player.id = player_id
+            player.position = [x, y]
+            player.direction = _decode_code(DIRECTIONS, direction)
+            player.score = score
+            player.bonuses = []
+            for _ in range(player_bonuses_count):
+                bonus_type, ticks = _player_bonus.unpack_from(buffer, position)
+                position += _player_bonus.size
+                player.bonuses.append((BONUS_TYPES[bonus_type], ticks))
+
+            added_count, removed_count = _counts.unpack_from(buffer, position)
+            position += _counts.size
+            added = _cells_from_bytes(buffer, position, added_count)
+            position += 2 * added_count
+            removed = _cells_from_bytes(buffer, position, removed_count)
+            position += 2 * removed_count
+            territory = set() if keyframe or previous is None else set(previous.territory)
+            territory.difference_update(removed)
+            territory.update(added)
+            player.territory = territory
+
+            kept, new_count = _counts.unpack_from(buffer, position)
+            position += _counts.size
+            lines = [] if keyframe or previous is None else previous.lines[:kept]
+            lines.extend(_cells_from_bytes(buffer, position, new_count))
+            position += 2 * new_count
+            player.lines = lines
+
+            players[player_id] = player
+
+        self.players = players
+        return tick_num, _decode_code(DIRECTIONS, command), bonuses
+
+    def build_state(self, tick_num, bonuses):
+        width, x_cells_count = self.width, self.x_cells_count
+
+        def to_pixels(cell):
+            return cell_to_pixels(cell, width, x_cells_count)
+
+        players = {}
+        for player_id, player in self.players.items():
+            players[player_id] = {
+                'score': player.score,
+                'direction': player.direction,
+                'territory': [to_pixels(cell) for cell in player.territory],
+                'lines': [to_pixels(cell) for cell in player.lines],
+                'position': list(player.position),
+                'bonuses': [{'type': bonus_type, 'ticks': ticks} for bonus_type, ticks in player.bonuses],
+            }
+        return {'players': players,
+                'bonuses': [{'type': bonus_type, 'position': to_pixels(cell)} for bonus_type, cell in bonuses],
+                'tick_num': tick_num}
+
+    def close(self):
+        self.buffer.close()
+        self.file.close()
+
+
+class RecordingBot:
+    """
+    обёртка над ботом, которая пишет его партию в replay-файл, например в локальном движке
+    """
+    def __init__(self, bot, path):
+        self.bot = bot
+        self.writer = ReplayWriter(path)
+
+    def on_game_start(self, config):
+        self.bot.on_game_start(config)
+        self.writer.start_game(config)
+
+    def on_tick(self, state):
+        command = self.bot.on_tick(state)
+        self.writer.tick(state, command)
+        return command
+
+    def close(self):
+        self.writer.end_game()
+        self.writer.close()
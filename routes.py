@@ -1,14 +1,40 @@
-from helpers import get_next_point, opposite_directions, normalize_point_cords,\
-    get_prev_location, get_side_directions
-from constants import SIDE_DIRECTIONS
-from maps import in_arena_bounds, get_neighbors, initialize_map
-from collections import deque
+from helpers import get_side_directions
+from constants import SIDE_DIRECTIONS, opposite_directions
+from grid import OUTSIDE
+from bitboard import get_bitboards, get_bitboard_stack, popcount
+from prefix_sums import SummedAreaTable
+from deadline import DeadlineExceeded
+from metrics import metrics
+from ticks import BONUS_MODES
+
+
+# число поворотов маршрута до базы
+MAX_SWITCH_COUNT = 2
+# сколько маршрутов заливается за один проход
+FILLING_BATCH_SIZE = 64
+
+# очки за клетку по коду: 0 - нейтральная, 1 - врага, 2 и 3 - моя территория или шлейф
+FILLING_POINTS = bytes.maketrans(b'\x00\x01\x02\x03', b'\x01\x05\x00\x00')
 
 
 def argmax(l):
     return max(list(range(len(l))), key=lambda x: l[x])
 
 
+def get_filling_weights(snapshot, lines_board):
+    """
+    префиксные суммы очков за закраску: 5 за клетку врага, 1 за нейтральную, 0 за территорию и шлейф
+    """
+    size = snapshot.x_cells_count * snapshot.y_cells_count
+    lines_mask = get_bitboards(snapshot.x_cells_count, snapshot.y_cells_count).to_mask(lines_board)
+    blocked = int.from_bytes(snapshot.my_territory_mask.cells, 'little') | \
+        int.from_bytes(lines_mask.cells, 'little')
+    # в каждом байте: 1 - клетка врага, 2 и 3 - занятая клетка
+    codes = (int.from_bytes(snapshot.enemy_territory_mask.cells, 'little') + 2 * blocked).to_bytes(size, 'little')
+    values = codes.translate(FILLING_POINTS)
+    return SummedAreaTable(snapshot.x_cells_count, snapshot.y_cells_count, values)
+
+
 class MinMax:
     __slots__ = ['xmin', 'ymin', 'xmax', 'ymax']
 
@@ -18,8 +44,7 @@ class MinMax:
         self.xmax = float('-inf')
         self.ymax = float('-inf')
 
-    def update(self, point):
-        x, y = point
+    def update(self, x, y):
         self.xmin = min(self.xmin, x)
         self.ymin = min(self.ymin, y)
         self.xmax = max(self.xmax, x)
@@ -33,202 +58,397 @@ class MinMax:
 
 
 class RoutesMaker:
-    def __init__(self, config, state, prev_move):
-        self.state = state
-        self.x_cells_count = config['x_cells_count']
-        self.y_cells_count = config['y_cells_count']
-        self.width = config['width']
+    def __init__(self, snapshot, prev_move, max_switch_count=MAX_SWITCH_COUNT):
+        """
+        шаги маршрута и дистанции от врагов считаются в тиках движка
+        """
+        self.snapshot = snapshot
+        self.max_switch_count = max_switch_count
+        self.x_cells_count = snapshot.x_cells_count
+        self.y_cells_count = snapshot.y_cells_count
+        self.width = snapshot.width
         self.prev_move = prev_move
+        # направление -> следующая клетка или OUTSIDE за краем арены
+        self.steps = snapshot.steps
 
-        self.slows = {normalize_point_cords(bonus['position'], self.width) for
-                      bonus in state['bonuses'] if bonus['type'] == 's'}
+        # тики на клетку: замедление считается до конца маршрута, а ускорение - нет, его срок может кончиться
+        self.pace = snapshot.my_pace
+        self.start_delta = max(self.pace.rate, self.pace.normal)
+        # клетка с бонусом -> тики на клетку после неё, подобранный бонус действует дольше маршрута
+        self.bonus_deltas = {cell: self.pace.rates[BONUS_MODES[kind]] for cell, kind in snapshot.bonus_map.items()}
+        # быстрее этого маршрут не идёт, по нему считается оценка сверху
+        self.min_delta = min([self.start_delta, *self.bonus_deltas.values()])
 
-        self.is_slow = any(bonus['type'] == 's' for bonus in state['players']['i']['bonuses'])
+        self.remaining_ticks = snapshot.remaining_ticks
 
-        self.remaining_ticks = ((2500 - self.state['tick_num']) / config['speed']) - 1
-        # self.remaining_ticks = float('inf')
+        self.curr_position = snapshot.me.position
 
-        my_position = state['players']['i']['position']
-        self.curr_position = normalize_point_cords(my_position, self.width)
+        # клетки на одной линии с территорией и её границы общие для тиков без захвата, поэтому только читаются
+        territory_info = snapshot.my_territory_info
+        self.my_territory, self.territory_cross = territory_info.cells, territory_info.cross
 
+        xmin, ymin, xmax, ymax = territory_info.bounds
+        self.territory_bounds = MinMax()
+        self.territory_bounds.update(xmin, ymin)
+        self.territory_bounds.update(xmax, ymax)
         min_max = MinMax()
-        self.my_territory, self.x_set, self.y_set = set(), set(), set()
-
-        for cords in state['players']['i']['territory']:
-            x, y = normalize_point_cords(cords, self.width)
-            self.my_territory.add((x, y))
-            self.x_set.add(x)
-            self.y_set.add(y)
-            min_max.update((x, y))
-
+        min_max.update(xmin, ymin)
+        min_max.update(xmax, ymax)
         self.min_max = min_max
-        self.lines = {normalize_point_cords((x, y), self.width) for x, y in state['players']['i']['lines']}
+        self.bitboards = get_bitboards(self.x_cells_count, self.y_cells_count)
+        # changes inplace further
+        self.lines = set(snapshot.me.lines)
 
-        for point in self.lines:
-            min_max.update(point)
+        for cell in self.lines:
+            min_max.update(cell % self.x_cells_count, cell // self.x_cells_count)
 
         self.backward_direction = opposite_directions[self.prev_move]
         self.side_directions = SIDE_DIRECTIONS[prev_move]
 
-        self.enemy_points = set()
-        self.enemy_territory = set()
-        for player_id, player_info in state['players'].items():
-            if player_id != 'i':
-                for x, y in player_info['territory']:
-                    self.enemy_territory.add(normalize_point_cords((x, y), self.width))
-
-                x, y = player_info['position']
-                self.enemy_points.add(normalize_point_cords((x, y), self.width))
+        self.enemy_points = snapshot.enemy_positions
+        self.enemy_territory = snapshot.enemy_territory
 
         if not self.enemy_points:
-            self.map = initialize_map(self.x_cells_count, self.y_cells_count, initial_value=self.remaining_ticks)
+            self.map = snapshot.pool.grid(fill=self.remaining_ticks)
         else:
-            self.map = initialize_map(self.x_cells_count, self.y_cells_count)
             self.run_bfs_from_enemies()
 
         self.routes = []
+        self.estimations = []
+        # клетки текущего маршрута, чтобы он не пересекал сам себя
+        self.route_points = set()
+        # начальные точки отрезков текущего маршрута, по ним считаются его границы
+        self.corners = []
+        self.deadline = None
+
+    def get_next_step(self, deadline=None):
+        """
+        :param deadline: если задан, после обычного перебора число поворотов увеличивается на 1,
+            пока не выйдет время или пока новые повороты не перестанут давать новых маршрутов
+        :returns: next move direction; если время вышло ещё в обычном переборе, лучший из найденных маршрутов
+        """
+        next_location = self.search_routes(deadline, keep_partial=True)
+        if deadline is None:
+            return next_location
+
+        routes, estimations = self.routes, self.estimations
+        while not deadline.expired():
+            self.max_switch_count += 1
+            try:
+                location = self.search_routes(deadline)
+            except DeadlineExceeded:
+                # глубина не досчитана, остаются маршруты предыдущей
+                self.max_switch_count -= 1
+                self.routes, self.estimations = routes, estimations
+                break
 
-    def get_next_step(self):
+            if len(self.routes) == len(routes):
+                break
+            routes, estimations, next_location = self.routes, self.estimations, location
+
+        return next_location
+
+    def search_routes(self, deadline=None, keep_partial=False):
         """
-        :returns: next move direction
+        перебор и оценка всех маршрутов не больше чем с max_switch_count поворотами
+        keep_partial - deadline проверяется только после того, как маршруты прямо вперёд перебраны и хоть один
+            найден, а когда он истекает, выбирается лучший из уже найденных маршрутов
+        raises DeadlineExceeded если deadline истёк посреди перебора без keep_partial
         """
         stack = []
-        min_weight = min([self.map[x][y] for x, y in self.lines]) if self.lines else float('inf')
+        self.routes = []
+        self.estimations = []
+        self.route_points = set()
+        self.corners = []
+        self.deadline = None if keep_partial else deadline
+        # при обычном числе поворотов оценка сверху почти ничего не отсекает и стоит дороже, чем экономит
+        self.use_bounds = self.max_switch_count > MAX_SWITCH_COUNT
+        self.prepare_estimation()
+        min_weight = min([self.map[point] for point in self.lines]) if self.lines else float('inf')
 
         if self.curr_position in self.lines:
             self.lines.remove(self.curr_position)
 
-        delta = 2 if self.is_slow else 1
+        delta = self.start_delta
         side_dir1, side_dir2 = get_side_directions(self.prev_move)
         # с помощью построения 3х сторон прямоугольника ищутся все безопасные пути до базы
         # снизу 3 разных начальных направления
-        self.get_valid_routes(self.curr_position, self.prev_move, 0, 0, min_weight, stack, delta)
-        self.get_valid_routes(self.curr_position, side_dir1, 0, 0, min_weight, stack, delta)
-        self.get_valid_routes(self.curr_position, side_dir2, 0, 0, min_weight, stack, delta)
-
-        self.lines.add(self.curr_position)
+        try:
+            self.min_record_switch_count = 0
+            self.get_valid_routes(self.curr_position, self.prev_move, 0, 0, min_weight, stack, delta)
+            # первые найденные перебором маршруты - мелкие петли, поэтому время проверяется не раньше,
+            # чем перебраны все маршруты прямо вперёд
+            if keep_partial and self.routes:
+                self.deadline = deadline
+            # маршруты, которые поворачивают в сторону сразу, уже найдены из первого направления
+            # с тем же подсчётом тиков, поэтому отсюда записываются только те, где на поворот больше
+            self.min_record_switch_count = self.max_switch_count
+            for side_dir in (side_dir1, side_dir2):
+                self.get_valid_routes(self.curr_position, side_dir, 0, 0, min_weight, stack, delta)
+        except DeadlineExceeded:
+            if not keep_partial:
+                raise
+            # каждый найденный маршрут безопасен, лучший из них лучше запасного пути домой
+            metrics.count('partial_routes')
+            self.deadline = None
+        finally:
+            self.lines.add(self.curr_position)
 
         estimations = self.estimate_valid_routes()
+        self.deadline = None
+        metrics.count('routes_enumerated', len(self.routes))
         if self.routes:
             return self.choose_best_route(estimations, self.routes)
 
-    def is_valid_location(self, curr_pos, steps_count):
-        if not in_arena_bounds(curr_pos) or curr_pos in self.lines:
-            return False
-        if self.map[curr_pos[0]][curr_pos[1]] - steps_count < 1:
-            return False
-        return True
-
     def check_location(self, curr_pos, steps_count, min_weight):
-        if not in_arena_bounds(curr_pos) or curr_pos in self.lines:
+        if curr_pos == OUTSIDE or curr_pos in self.lines:
             return False, min_weight
 
-        min_weight = min(min_weight, self.map[curr_pos[0]][curr_pos[1]])
+        min_weight = min(min_weight, self.map.cells[curr_pos])
         if min_weight - steps_count < 1:
             return False, min_weight
 
         return True, min_weight
 
-    def get_valid_routes(self, curr_pos, direction, switch_count, steps_count, min_weight, stack, delta=1):
+    def get_valid_routes(self, curr_pos, direction, switch_count, steps_count, min_weight, stack, delta):
         """
         stack contains current route and changes inplace
+        steps_count - тики до curr_pos, delta - тики на следующую клетку
         """
+        if self.deadline is not None:
+            self.deadline.check()
+
+        if curr_pos == OUTSIDE:
+            return
+
         # если данный путь является возвратным, но не находится на одной линии с базой
-        if switch_count == 2:
-            if curr_pos[0] not in self.x_set and curr_pos[1] not in self.y_set:
+        if switch_count == self.max_switch_count:
+            if curr_pos not in self.territory_cross:
                 return
 
+        # даже самая выгодная достройка маршрута не даст больше уже найденного
+        # последний отрезок дешевле пройти, чем оценивать
+        if self.use_bounds and switch_count < self.max_switch_count and self.best_estimation and \
+                self.get_upper_estimation(curr_pos, steps_count, min_weight, stack) < self.best_estimation:
+            return
+
         dir1, dir2 = get_side_directions(direction)
+        steps = self.steps
         stack.append(curr_pos)
+        self.corners.append(curr_pos)
         i = 1
+        added = 0
         while True:
+            # при двух поворотах не встречается, но с большим числом поворотов маршрут может закрутиться
+            if curr_pos in self.route_points:
+                break
 
             is_valid_location, min_weight = self.check_location(curr_pos, steps_count, min_weight)
             if not is_valid_location:
                 break
 
             if curr_pos in self.my_territory:
-                self.routes.append([pos for pos in stack])
+                if switch_count >= self.min_record_switch_count:
+                    self.add_route([pos for pos in stack])
                 break
 
+            self.route_points.add(curr_pos)
+            added += 1
+
+            # бонус на клетке меняет скорость со следующего шага
+            delta = self.bonus_deltas.get(curr_pos, delta)
+
             # попробовать повернуть
-            if switch_count < 2:
+            if switch_count < self.max_switch_count:
                 for side_dir in (dir1, dir2):
-                    next_pos = get_next_point(curr_pos, side_dir, 1)
-                    self.get_valid_routes(next_pos, side_dir, switch_count+1, steps_count+delta, min_weight, stack)
-
-            curr_pos = get_next_point(curr_pos, direction, 1)
+                    next_pos = steps[side_dir][curr_pos]
+                    self.get_valid_routes(next_pos, side_dir, switch_count+1, steps_count+delta, min_weight, stack,
+                                          delta)
 
-            if curr_pos in self.slows:
-                delta = 2
+            curr_pos = steps[direction][curr_pos]
 
             stack.append(curr_pos)
             steps_count += delta
             i += 1
 
         # удаление текущей линии из стека
-        for _ in range(i):
-            stack.pop()
+        self.corners.pop()
+        for j in range(i):
+            point = stack.pop()
+            if j >= i - added:
+                self.route_points.discard(point)
 
-    def estimate_valid_routes(self):
-        estimations = []
-        for route in self.routes:
-            route_set = set()
+    def get_upper_estimation(self, curr_pos, steps_count, min_weight, stack):
+        """
+        оценка сверху очков любого маршрута, продолжающего stack из curr_pos
+        дальше маршрут пройдёт не больше radius = (min_weight - 1 - steps_count) // min_delta клеток
+        и вернётся на территорию, поэтому за границу территории он отойдёт не дальше чем на половину того,
+        что останется после подхода к ней
+        у ортогонально выпуклой территории любой столбец или строка вне границ маршрута и шлейфа
+        выходят к краю области заливки, поэтому закраска лежит внутри границ маршрута и шлейфа
+        """
+        radius = (min(min_weight, self.remaining_ticks) - 1 - steps_count) // self.min_delta
+        x_count = self.x_cells_count
+        y, x = divmod(curr_pos, x_count)
+        bounds = self.territory_bounds
+        xmin, ymin = min(x, (x + bounds.xmin - radius) // 2), min(y, (y + bounds.ymin - radius) // 2)
+        xmax, ymax = max(x, (x + bounds.xmax + radius) // 2), max(y, (y + bounds.ymax + radius) // 2)
+        if not self.is_convex:
+            # вогнутая территория может закрыть карман вне границ маршрута и шлейфа
+            xmin, ymin = min(xmin, bounds.xmin), min(ymin, bounds.ymin)
+            xmax, ymax = max(xmax, bounds.xmax), max(ymax, bounds.ymax)
+
+        # закраска не выходит за границы шлейфа и ломаной маршрута, которые задаются её вершинами
+        lines_min_max = self.lines_min_max
+        xmin, ymin = min(xmin, lines_min_max.xmin), min(ymin, lines_min_max.ymin)
+        xmax, ymax = max(xmax, lines_min_max.xmax), max(ymax, lines_min_max.ymax)
+        for corner in self.corners:
+            corner_y, corner_x = divmod(corner, x_count)
+            xmin, xmax = min(xmin, corner_x), max(xmax, corner_x)
+            ymin, ymax = min(ymin, corner_y), max(ymax, corner_y)
+        if stack:
+            corner_y, corner_x = divmod(stack[-1], x_count)
+            xmin, xmax = min(xmin, corner_x), max(xmax, corner_x)
+            ymin, ymax = min(ymin, corner_y), max(ymax, corner_y)
+
+        # закрашиваются только клетки строго внутри границ
+        return self.get_filling_table().sum(xmin + 1, ymin + 1, xmax - 1, ymax - 1)
+
+    def get_filling_table(self):
+        if self.filling_weights is None:
+            snapshot = self.snapshot
+            # таблица могла быть посчитана заранее в фоне, пока бот ждал этот тик
+            if snapshot.world is not None:
+                key = (snapshot.me.territory, snapshot.enemy_territory, self.lines_board)
+                self.filling_weights = snapshot.world.get_speculation('filling_weights', key)
+            if self.filling_weights is None:
+                self.filling_weights = get_filling_weights(snapshot, self.lines_board)
+        return self.filling_weights
+
+    def prepare_estimation(self):
+        """
+        всё, что нужно для оценки маршрутов по ходу перебора
+        шлейф считается вместе с текущей позицией, как и после перебора
+        """
+        bitboards = self.bitboards
+        self.lines_board = bitboards.from_cells(self.lines) | bitboards.from_cells([self.curr_position])
+        self.blocked = self.snapshot.my_territory_board | self.lines_board
+        # префиксные суммы и выпуклость считаются при первой необходимости, маршрутов может не найтись
+        self.filling_weights = None
+        self.is_convex = None
+
+        x_count = self.x_cells_count
+        self.lines_min_max = MinMax()
+        for cell in self.lines:
+            self.lines_min_max.update(cell % x_count, cell // x_count)
+        self.lines_min_max.update(self.curr_position % x_count, self.curr_position // x_count)
+
+        # маршруты, которые нужно заливать: (индекс, границы, доска маршрута)
+        self.filling_queue = []
+        self.best_estimation = 0
+
+    def add_route(self, route):
+        """
+        маршрут оценивается сразу, если хватает префиксных сумм, иначе ставится в очередь на заливку
+        """
+        x_count = self.x_cells_count
+        route_board = 0
+        route_min_max = MinMax()
+        for cell in route:
+            route_board |= 1 << cell
+            route_min_max.update(cell % x_count, cell // x_count)
+
+        # границы маршрута вместе со шлейфом
+        lines_min_max = self.lines_min_max
+        route_min_max.update(lines_min_max.xmin, lines_min_max.ymin)
+        route_min_max.update(lines_min_max.xmax, lines_min_max.ymax)
+
+        if self.is_convex is None:
+            # для ортогонально выпуклой территории очки считаются по префиксным суммам без заливки
+            self.is_convex = self.snapshot.my_territory_info.is_convex
+
+        estimation = None
+        if self.is_convex:
+            estimation = self.filling_rectangle(route_min_max, self.blocked, route_board, self.get_filling_table())
+
+        if estimation is None:
             curr_min_max = MinMax()
-            for x, y in route:
-                route_set.add((x, y))
-                curr_min_max.update((x, y))
-
-            curr_min_max.update((self.min_max.xmin, self.min_max.ymin))
-            curr_min_max.update((self.min_max.xmax, self.min_max.ymax))
+            curr_min_max.update(route_min_max.xmin, route_min_max.ymin)
+            curr_min_max.update(route_min_max.xmax, route_min_max.ymax)
+            curr_min_max.update(self.min_max.xmin, self.min_max.ymin)
+            curr_min_max.update(self.min_max.xmax, self.min_max.ymax)
+            self.filling_queue.append((len(self.estimations), curr_min_max, route_board))
+        else:
+            self.best_estimation = max(self.best_estimation, estimation)
 
-            curr_min_max.expand()
+        self.routes.append(route)
+        self.estimations.append(estimation)
 
-            estimation = 0
-            # changes inplace
-            visited = set()
+        if len(self.filling_queue) >= FILLING_BATCH_SIZE:
+            self.fill_queued_routes()
 
-            # подсчёт очков при закраске без учёта длинны шлейфа
-            for x in range(int(curr_min_max.xmin+1), int(curr_min_max.xmax)):
-                for y in range(int(curr_min_max.ymin+1), int(curr_min_max.ymax)):
-                    if (x, y) in visited or (x, y) in self.my_territory or (x, y) in self.lines or (x, y) in route_set:
-                        continue
+    def fill_queued_routes(self):
+        """
+        подсчёт очков при закраске без учёта длинны шлейфа, сразу пачкой маршрутов
+        """
+        if self.deadline is not None:
+            self.deadline.check()
 
-                    estimation += self.filling_bfs((x, y), curr_min_max, visited, route_set)
+        batch, self.filling_queue = self.filling_queue, []
+        scores = self.filling_bfs([min_max for _, min_max, _ in batch],
+                                  [self.blocked | route_board for _, _, route_board in batch])
+        for (index, _, _), score in zip(batch, scores):
+            self.estimations[index] = score
+            self.best_estimation = max(self.best_estimation, score)
 
-            estimations.append(estimation)
-        return estimations
+    def estimate_valid_routes(self):
+        if self.filling_queue:
+            self.fill_queued_routes()
+        return self.estimations
 
-    def filling_bfs(self, position, min_max, visited, route):
-        queue = deque([position])
-        visited.add(position)
-        game_points = 5 if (position[0], position[1]) in self.enemy_territory else 1
-        is_surrounded = True
+    def filling_rectangle(self, min_max, blocked, route_board, filling_weights):
+        """
+        если граница прямоугольника маршрута целиком занята шлейфом, маршрутом или территорией,
+        то закрашивается вся его внутренность и ничего снаружи (территория ортогонально выпукла)
+        returns None если контур не замкнут
+        """
+        bitboards = self.bitboards
+        area = bitboards.rectangle(min_max.xmin, min_max.ymin, min_max.xmax, min_max.ymax)
+        inner_area = bitboards.rectangle(min_max.xmin + 1, min_max.ymin + 1, min_max.xmax - 1, min_max.ymax - 1)
 
-        while queue:
-            for _ in range(len(queue)):
-                curr_pos = queue.popleft()
+        if area & ~inner_area & ~(blocked | route_board):
+            return None
 
-                for neighbor in get_neighbors(curr_pos):
-                    x, y = neighbor
+        estimation = filling_weights.sum(min_max.xmin + 1, min_max.ymin + 1, min_max.xmax - 1, min_max.ymax - 1)
 
-                    if neighbor in visited:
-                        continue
+        # клетки самого маршрута внутри прямоугольника не закрашиваются
+        inner_route = route_board & inner_area & ~blocked
+        if inner_route:
+            estimation -= popcount(inner_route) + 4 * popcount(inner_route & self.snapshot.enemy_territory_board)
+        return estimation
 
-                    if not (min_max.xmin < x < min_max.xmax and min_max.ymin < y < min_max.ymax):
-                        is_surrounded = False
-                        continue
+    def filling_bfs(self, min_maxes, blocked_boards):
+        """
+        очки за клетки внутри каждого min_max, которые окружены шлейфом, маршрутом и территорией
+        доски всех маршрутов укладываются в одно целое и заливаются от краёв областей одновременно,
+        всё что заливка не достала - закрашивается
+        """
+        bitboards = self.bitboards
+        stack = get_bitboard_stack(self.x_cells_count, self.y_cells_count, len(min_maxes))
 
-                    if (x, y) in self.my_territory or (x, y) in self.lines or (x, y) in route:
-                        continue
+        areas = stack.join([bitboards.rectangle(min_max.xmin, min_max.ymin, min_max.xmax, min_max.ymax)
+                            for min_max in min_maxes])
+        inner_areas = stack.join([bitboards.rectangle(min_max.xmin + 1, min_max.ymin + 1,
+                                                      min_max.xmax - 1, min_max.ymax - 1)
+                                  for min_max in min_maxes])
 
-                    visited.add((x, y))
-                    game_points += 5 if (x, y) in self.enemy_territory else 1
-                    queue.append((x,y))
+        free = areas & ~stack.join(blocked_boards)
+        not_surrounded = stack.flood(free & ~inner_areas, free)
+        surrounded = free & ~not_surrounded
+        enemy_surrounded = surrounded & stack.replicate(self.snapshot.enemy_territory_board)
 
-        if is_surrounded:
-            return game_points
-        return 0
+        return [popcount(points) + 4 * popcount(enemy_points)
+                for points, enemy_points in zip(stack.split(surrounded), stack.split(enemy_surrounded))]
 
     def choose_best_route(self, estimations, routes):
         best_estimation_index = argmax(estimations)
@@ -242,25 +462,14 @@ class RoutesMaker:
         return next_location
 
     def run_bfs_from_enemies(self):
-
-        queue = deque(self.enemy_points)
-
-        for x, y in self.enemy_points:
-            self.map[x][y] = 0
-
-        step_num = 0
-
-        while queue:
-            step_num += 1
-            for _ in range(len(queue)):
-                point = queue.popleft()
-
-                for neighbor in get_neighbors(point):
-                    if not in_arena_bounds(neighbor):
-                        continue
-
-                    x, y = neighbor
-
-                    if self.map[x][y] is None or self.map[x][y] > min(step_num, self.remaining_ticks):
-                        self.map[x][y] = min(step_num, self.remaining_ticks)
-                        queue.append((x, y))
\ No newline at end of file
+        # поле общее с ThreatsMap, поэтому обрезается в копии из буферов тика
+        # без поля не найти ни одного маршрута, а запасной путь домой играет намного слабее,
+        # поэтому оно досчитывается и после дедлайна, прерывается только перебор
+        field = self.snapshot.get_enemy_ticks()
+        self.map = self.snapshot.pool.copy(field.dist)
+
+        # дальше оставшегося времени враг всё равно не доберётся
+        cells, remaining_ticks = self.map.cells, self.remaining_ticks
+        for index, distance in enumerate(cells):
+            if distance > remaining_ticks:
+                cells[index] = remaining_ticks
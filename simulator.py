@@ -0,0 +1,321 @@
+"""
+локальный движок Paper.io для игры ботов друг с другом без сервера
+
+боты вызываются в том же процессе: on_game_start(config) и on_tick(state) -> команда,
+state собирается в том же виде, что и в протоколе (пиксели, 'i' для себя), но без json
+"""
+
+import random
+import time
+import argparse
+
+from constants import LEFT, RIGHT, UP, DOWN, opposite_directions
+from snapshot import MAX_TICK_COUNT
+from bitboard import get_bitboards
+from ticks import get_speeds, NITRO, SLOW
+
+DEFAULT_CONFIG = {'x_cells_count': 31, 'y_cells_count': 31, 'speed': 5, 'width': 30}
+
+MOVES = {LEFT: (-1, 0), RIGHT: (1, 0), UP: (0, 1), DOWN: (0, -1)}
+
+# очки за клетку при захвате: нейтральная, вражеская и за срезанный шлейф
+NEUTRAL_CELL_POINTS = 1
+ENEMY_CELL_POINTS = 5
+TAIL_CUT_POINTS = 50
+
+# шанс появления бонуса за тик, сколько их может лежать на карте и сколько клеток действуют
+BONUS_CHANCE = 0.01
+MAX_BONUSES = 3
+BONUS_CELLS = (10, 50)
+
+
+def from_points(x_cells_count, points):
+    """
+    доска из клеток (x, y), у симулятора клетки хранятся точками
+    """
+    board = 0
+    for x, y in points:
+        board |= 1 << (y * x_cells_count + x)
+    return board
+
+
+def to_points(x_cells_count, board):
+    points = []
+    while board:
+        low_bit = board & -board
+        index = low_bit.bit_length() - 1
+        points.append((index % x_cells_count, index // x_cells_count))
+        board ^= low_bit
+    return points
+
+
+def get_start_cells(x_cells_count, y_cells_count):
+    xs = (x_cells_count // 6, x_cells_count // 2, x_cells_count - 1 - x_cells_count // 6)
+    ys = (y_cells_count // 4, y_cells_count - 1 - y_cells_count // 4)
+    return [(x, y) for y in ys for x in xs]
+
+
+class SimPlayer:
+    __slots__ = ['id', 'bot', 'position', 'direction', 'territory', 'lines', 'score', 'alive',
+                 'bonuses', 'latencies']
+
+    def __init__(self, player_id, bot, cell, width):
+        self.id = player_id
+        self.bot = bot
+        self.position = [cell[0] * width + width // 2, cell[1] * width + width // 2]
+        self.direction = None
+        x, y = cell
+        self.territory = {(x + dx, y + dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1)}
+        self.lines = []
+        self.score = 0
+        self.alive = True
+        # [тип, сколько клеток ещё действует]
+        self.bonuses = []
+        # секунды на каждый вызов on_tick
+        self.latencies = []
+
+    def has_bonus(self, bonus_type):
+        return any(bonus[0] == bonus_type for bonus in self.bonuses)
+
+
+class GameResult:
+    """
+    players - (id, score, alive) в порядке игроков
+    latencies - id -> список секунд на тик
+    """
+    __slots__ = ['players', 'ticks', 'latencies']
+
+    def __init__(self, players, ticks):
+        self.players = [(player.id, player.score, player.alive) for player in players]
+        self.ticks = ticks
+        self.latencies = {player.id: player.latencies for player in players}
+
+    def ranking(self):
+        """
+        id игроков от лучшего к худшему: сначала выжившие, затем по очкам
+        """
+        return [player_id for player_id, score, alive in
+                sorted(self.players, key=lambda player: (not player[2], -player[1]))]
+
+
+class Game:
+    """
+    bots - объекты с on_game_start(config) и on_tick(state), от 1 до 6
+    один seed - одна и та же партия: от него зависят стартовые места, бонусы и модуль random ботов
+    """
+    def __init__(self, bots, config=None, seed=0, max_tick=MAX_TICK_COUNT):
+        self.config = dict(config or DEFAULT_CONFIG)
+        self.width = self.config['width']
+        self.x_cells_count = self.config['x_cells_count']
+        self.y_cells_count = self.config['y_cells_count']
+        self.speed = self.config['speed']
+        self.nitro_speed, self.slow_speed = get_speeds(self.width, self.speed)
+        self.max_tick = max_tick
+        self.seed = seed
+        self.random = random.Random(seed)
+        self.tick = 0
+
+        cells = get_start_cells(self.x_cells_count, self.y_cells_count)
+        self.random.shuffle(cells)
+        self.players = [SimPlayer(index + 1, bot, cells[index], self.width) for index, bot in enumerate(bots)]
+
+        # клетка -> тип бонуса
+        self.bonuses = {}
+
+        self.bitboards = get_bitboards(self.x_cells_count, self.y_cells_count)
+        full_area = self.bitboards.rectangle(0, 0, self.x_cells_count - 1, self.y_cells_count - 1)
+        self.edges = full_area & ~self.bitboards.rectangle(1, 1, self.x_cells_count - 2, self.y_cells_count - 2)
+
+    def play(self):
+        random.seed(self.seed)
+        for player in self.players:
+            player.bot.on_game_start(dict(self.config))
+
+        while self.tick < self.max_tick and self.step():
+            pass
+
+        return GameResult(self.players, self.tick)
+
+    def step(self):
+        """
+        один тик движка
+        returns False если игра закончилась
+        """
+        alive = [player for player in self.players if player.alive]
+        if not alive or (len(self.players) > 1 and len(alive) == 1):
+            return False
+
+        self.tick += 1
+        self.spawn_bonus()
+
+        for player in alive:
+            if self.in_cell_center(player):
+                self.ask_command(player)
+
+        for player in alive:
+            if player.direction is not None:
+                dx, dy = MOVES[player.direction]
+                speed = self.get_speed(player)
+                player.position[0] += dx * speed
+                player.position[1] += dy * speed
+
+        arrived = [player for player in alive if player.direction is not None and self.in_cell_center(player)]
+        self.process_arrivals(arrived)
+        return True
+
+    def ask_command(self, player):
+        state = self.build_state(player)
+        start_time = time.perf_counter()
+        command = player.bot.on_tick(state)
+        player.latencies.append(time.perf_counter() - start_time)
+
+        if command not in MOVES:
+            return
+        # развернуться назад нельзя
+        if player.direction is not None and command == opposite_directions[player.direction]:
+            return
+        player.direction = command
+
+    def process_arrivals(self, arrived):
+        cells = {player.id: self.get_cell(player) for player in arrived}
+
+        for player in arrived:
+            x, y = cells[player.id]
+            if not (0 <= x < self.x_cells_count and 0 <= y < self.y_cells_count):
+                player.alive = False
+
+        # пересечение шлейфа: владелец шлейфа погибает, в том числе если это сам игрок
+        for player in arrived:
+            if not player.alive:
+                continue
+            for other in self.players:
+                if other.alive and cells[player.id] in other.lines:
+                    other.alive = False
+                    if other is not player:
+                        player.score += TAIL_CUT_POINTS
+
+        # лобовое столкновение: выживает тот, у кого шлейф короче, при равных погибают оба
+        crashed = [player for player in arrived for other in arrived
+                   if other is not player and player.alive and other.alive and
+                   cells[player.id] == cells[other.id] and len(player.lines) >= len(other.lines)]
+        for player in crashed:
+            player.alive = False
+
+        for player in arrived:
+            if not player.alive:
+                continue
+            cell = cells[player.id]
+            self.update_bonuses(player, cell)
+
+            if cell in player.territory:
+                if player.lines:
+                    self.capture(player)
+            else:
+                player.lines.append(cell)
+
+        for player in self.players:
+            if player.alive and not player.territory:
+                player.alive = False
+
+    def capture(self, player):
+        """
+        всё, что окружено территорией и шлейфом и не достаётся заливкой от краёв карты
+        """
+        bitboards = self.bitboards
+        x_cells_count = bitboards.x_cells_count
+        territory = from_points(x_cells_count, player.territory)
+        blocked = territory | from_points(x_cells_count, player.lines)
+        outside = bitboards.flood(self.edges & ~blocked, bitboards.full & ~blocked)
+        captured = set(to_points(x_cells_count, bitboards.full & ~outside & ~territory))
+
+        for other in self.players:
+            if other is player or not other.alive:
+                continue
+            lost = captured & other.territory
+            if lost:
+                player.score += ENEMY_CELL_POINTS * len(lost)
+                captured -= lost
+                other.territory -= lost
+                player.territory |= lost
+
+        player.score += NEUTRAL_CELL_POINTS * len(captured)
+        player.territory |= captured
+        player.lines = []
+
+    def update_bonuses(self, player, cell):
+        # бонусы действуют заданное число клеток
+        player.bonuses = [[bonus_type, cells - 1] for bonus_type, cells in player.bonuses if cells > 1]
+
+        bonus_type = self.bonuses.pop(cell, None)
+        if bonus_type is not None:
+            # новый бонус заменяет действующий бонус скорости
+            player.bonuses = [bonus for bonus in player.bonuses if bonus[0] not in (NITRO, SLOW)]
+            player.bonuses.append([bonus_type, self.random.randint(*BONUS_CELLS)])
+
+    def spawn_bonus(self):
+        if len(self.bonuses) >= MAX_BONUSES or self.random.random() >= BONUS_CHANCE:
+            return
+
+        cell = (self.random.randrange(self.x_cells_count), self.random.randrange(self.y_cells_count))
+        for player in self.players:
+            if player.alive and (cell in player.territory or cell in player.lines or cell == self.get_cell(player)):
+                return
+        self.bonuses[cell] = self.random.choice((NITRO, SLOW))
+
+    def get_speed(self, player):
+        if player.has_bonus(NITRO):
+            return self.nitro_speed
+        if player.has_bonus(SLOW):
+            return self.slow_speed
+        return self.speed
+
+    def in_cell_center(self, player):
+        half = self.width // 2
+        return (player.position[0] - half) % self.width == 0 and (player.position[1] - half) % self.width == 0
+
+    def get_cell(self, player):
+        return player.position[0] // self.width, player.position[1] // self.width
+
+    def to_pixels(self, cell):
+        return [cell[0] * self.width + self.width // 2, cell[1] * self.width + self.width // 2]
+
+    def build_state(self, me):
+        players = {}
+        for player in self.players:
+            if not player.alive:
+                continue
+            players['i' if player is me else str(player.id)] = {
+                'score': player.score,
+                'direction': player.direction,
+                'territory': [self.to_pixels(cell) for cell in player.territory],
+                'lines': [self.to_pixels(cell) for cell in player.lines],
+                'position': list(player.position),
+                'bonuses': [{'type': bonus_type, 'ticks': cells} for bonus_type, cells in player.bonuses],
+            }
+
+        bonuses = [{'type': bonus_type, 'position': self.to_pixels(cell)} for cell, bonus_type in self.bonuses.items()]
+        return {'players': players, 'bonuses': bonuses, 'tick_num': self.tick}
+
+
+def main():
+    from algo import Bot
+
+    parser = argparse.ArgumentParser(description='сыграть локальные партии ботов друг с другом')
+    parser.add_argument('--players', type=int, default=6)
+    parser.add_argument('--games', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--max-tick', type=int, default=MAX_TICK_COUNT)
+    args = parser.parse_args()
+
+    for seed in range(args.seed, args.seed + args.games):
+        start_time = time.perf_counter()
+        result = Game([Bot() for _ in range(args.players)], seed=seed, max_tick=args.max_tick).play()
+        latencies = sorted(latency for values in result.latencies.values() for latency in values)
+        print(f'seed {seed}: ticks {result.ticks}, time {time.perf_counter() - start_time:.1f}s, '
+              f'max tick {1000 * latencies[-1]:.1f}ms')
+        for player_id, score, alive in result.players:
+            print(f'  player {player_id}: score {score}{"" if alive else ", dead"}')
+
+
+if __name__ == '__main__':
+    main()
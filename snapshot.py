@@ -0,0 +1,199 @@
+from functools import cached_property
+
+from helpers import point_to_cell
+from bitboard import get_bitboards
+from distance_fields import DistanceFields
+from grid import get_neighbor_table, get_step_table, GridPool
+from world import TerritoryInfo
+from ticks import Pace, NITRO, SLOW
+
+MAX_TICK_COUNT = 2500
+
+
+def to_cells(points, width, x_cells_count):
+    """
+    пиксельные центры клеток в индексы клеток за один проход, координаты неотрицательные
+    """
+    return frozenset([y // width * x_cells_count + x // width for x, y in points])
+
+
+class PlayerSnapshot:
+    """
+    состояние одного игрока, клетки - индексы y * x_cells_count + x
+    territory и lines переводятся из пикселей при первом обращении: у врагов часть стадий их не читает
+    """
+    __slots__ = ['id', 'position', 'bonuses', 'bonus_ticks', 'direction', 'score', 'width', 'x_cells_count',
+                 'raw_territory', 'raw_lines', '_territory', '_lines']
+
+    def __init__(self, player_id, player_info, width, x_cells_count):
+        self.id = player_id
+        self.width = width
+        self.x_cells_count = x_cells_count
+        self.position = point_to_cell(player_info['position'], width, x_cells_count)
+        self.raw_territory = player_info['territory']
+        self.raw_lines = player_info['lines']
+        self._territory = None
+        self._lines = None
+        self.bonuses = tuple(bonus['type'] for bonus in player_info.get('bonuses', ()))
+        # тип -> сколько бонус ещё действует, в клетках
+        self.bonus_ticks = {bonus['type']: bonus.get('ticks', 0) for bonus in player_info.get('bonuses', ())}
+        self.direction = player_info.get('direction')
+        self.score = player_info.get('score', 0)
+
+    @property
+    def territory(self):
+        if self._territory is None:
+            self._territory = to_cells(self.raw_territory, self.width, self.x_cells_count)
+        return self._territory
+
+    @property
+    def lines(self):
+        if self._lines is None:
+            self._lines = to_cells(self.raw_lines, self.width, self.x_cells_count)
+        return self._lines
+
+    def has_bonus(self, bonus_type):
+        return bonus_type in self.bonuses
+
+
+class GameSnapshot:
+    """
+    состояние тика, один раз переведённое из пикселей в индексы клеток y * x_cells_count + x
+    строится в Bot.on_tick и передаётся во все карты вместо (config, state)
+    производные множества, маски и доски считаются при первом обращении и дальше не меняются
+    с моделью мира территории и bfs-поля переносятся с прошлого тика, если не было захвата
+    deadline - Deadline тика, его проверяют тяжёлые bfs карт; None - без ограничения
+    pool - GridPool бота, из которого карты берут буферы на тик; без него у снимка свой пул
+    """
+    def __init__(self, config, state, world=None, deadline=None, pool=None):
+        self.width = config['width']
+        self.x_cells_count = config['x_cells_count']
+        self.y_cells_count = config['y_cells_count']
+        self.speed = config['speed']
+        self.tick_num = state['tick_num']
+        self.neighbors = get_neighbor_table(self.x_cells_count, self.y_cells_count)
+        # направление -> соседняя клетка по индексу клетки или OUTSIDE
+        self.steps = get_step_table(self.x_cells_count, self.y_cells_count)
+
+        self.players = {}
+        for player_id, player_info in state['players'].items():
+            self.players[player_id] = PlayerSnapshot(player_id, player_info, self.width, self.x_cells_count)
+
+        self.me = self.players['i']
+        self.enemies = tuple(player for player_id, player in self.players.items() if player_id != 'i')
+
+        self.enemy_positions = frozenset(enemy.position for enemy in self.enemies)
+
+        self.bonuses = tuple((bonus['type'], point_to_cell(bonus['position'], self.width, self.x_cells_count))
+                             for bonus in state['bonuses'])
+
+        self.world = world
+        self.deadline = deadline
+        if world is not None:
+            world.next_tick(self.players)
+            self.fields = world.fields
+        else:
+            # bfs-поля этого тика, общие для всех карт
+            self.fields = DistanceFields(self.x_cells_count, self.y_cells_count)
+
+        if pool is not None:
+            # буферы прошлого тика больше никому не нужны
+            pool.next_tick()
+        else:
+            pool = GridPool(self.x_cells_count, self.y_cells_count)
+        self.pool = pool
+
+    def get_territory_info(self, player):
+        if self.world is None:
+            return TerritoryInfo(player.territory, self.x_cells_count, self.y_cells_count)
+        return self.world.get_territory(player.id, player.territory)
+
+    @cached_property
+    def my_territory_info(self):
+        return self.get_territory_info(self.me)
+
+    @cached_property
+    def enemy_territory_info(self):
+        if self.world is None:
+            cells = frozenset().union(*(enemy.territory for enemy in self.enemies))
+            return TerritoryInfo(cells, self.x_cells_count, self.y_cells_count)
+        return self.world.get_enemy_territory(self.get_territory_info(enemy) for enemy in self.enemies)
+
+    @property
+    def enemy_territory(self):
+        return self.enemy_territory_info.cells
+
+    @cached_property
+    def enemy_lines(self):
+        """
+        клетка шлейфа -> id врага
+        """
+        enemy_lines = {}
+        for enemy in self.enemies:
+            for cell in enemy.lines:
+                enemy_lines[cell] = enemy.id
+        return enemy_lines
+
+    @property
+    def my_territory_mask(self):
+        return self.my_territory_info.mask
+
+    @property
+    def enemy_territory_mask(self):
+        return self.enemy_territory_info.mask
+
+    @property
+    def my_territory_board(self):
+        return self.my_territory_info.board
+
+    @cached_property
+    def my_lines_board(self):
+        return get_bitboards(self.x_cells_count, self.y_cells_count).from_cells(self.me.lines)
+
+    @property
+    def enemy_territory_board(self):
+        return self.enemy_territory_info.board
+
+    @property
+    def remaining_ticks(self):
+        """
+        тики, за которые нужно успеть вернуться: последняя клетка должна быть пройдена до конца игры
+        """
+        return MAX_TICK_COUNT - self.tick_num - self.my_pace.normal
+
+    @cached_property
+    def bonus_map(self):
+        """
+        клетка -> тип бонуса на карте
+        """
+        return {cell: kind for kind, cell in self.bonuses}
+
+    def get_pace(self, player):
+        """
+        Pace игрока с его активным бонусом
+        """
+        for bonus_type in (NITRO, SLOW):
+            if player.has_bonus(bonus_type):
+                return Pace(self.width, self.speed, bonus_type, player.bonus_ticks[bonus_type])
+        return Pace(self.width, self.speed)
+
+    @cached_property
+    def my_pace(self):
+        return self.get_pace(self.me)
+
+    def get_enemy_ticks(self, max_ticks=None, deadline=None):
+        """
+        поле в тиках от голов всех врагов с их скоростями и бонусами на карте, общее для всех карт
+        deadline - Deadline тика для прерываемых карт вроде AttacksMap; ThreatsMap считает поле без него,
+        потому что нужен и запасному ходу, который выбирается уже после дедлайна, RoutesMaker - потому что
+        без поля не найдёт ни одного маршрута
+        """
+        groups = {}
+        for enemy in self.enemies:
+            groups.setdefault(self.get_pace(enemy), []).append(enemy.position)
+        return self.fields.get_ticks(groups, self.bonus_map, max_ticks=max_ticks, deadline=deadline)
+
+    def __setattr__(self, key, value):
+        if key in self.__dict__:
+            raise AttributeError(f'GameSnapshot is immutable, can not reassign {key}')
+        super().__setattr__(key, value)
@@ -0,0 +1,140 @@
+"""
+очки маршрута по префиксным суммам против заливки на случайных территориях
+
+    python -m pytest test_routes.py
+"""
+
+import random
+import unittest
+
+from routes import RoutesMaker, MinMax
+from snapshot import GameSnapshot
+
+WIDTH = 30
+CELLS_COUNT = 31
+CONFIG = {'width': WIDTH, 'x_cells_count': CELLS_COUNT, 'y_cells_count': CELLS_COUNT, 'speed': 5}
+CASES_COUNT = 200
+
+
+def to_pixels(x, y):
+    return [x * WIDTH + WIDTH // 2, y * WIDTH + WIDTH // 2]
+
+
+def random_rectangle(rnd, min_side=2, max_side=10):
+    """
+    returns (xmin, ymin, xmax, ymax) внутри арены, границы включаются
+    """
+    width, height = rnd.randint(min_side, max_side), rnd.randint(min_side, max_side)
+    xmin, ymin = rnd.randint(0, CELLS_COUNT - width), rnd.randint(0, CELLS_COUNT - height)
+    return xmin, ymin, xmin + width - 1, ymin + height - 1
+
+
+def rectangle_points(xmin, ymin, xmax, ymax):
+    return {(x, y) for x in range(xmin, xmax + 1) for y in range(ymin, ymax + 1)}
+
+
+def random_territory(rnd, cross):
+    """
+    прямоугольник или крест из двух прямоугольников: у креста каждая строка и столбец тоже идут подряд
+    """
+    xmin, ymin, xmax, ymax = random_rectangle(rnd, min_side=3)
+    points = rectangle_points(xmin, ymin, xmax, ymax)
+    if cross:
+        # второй прямоугольник уже по x и выше по y, чем первый
+        inner_xmin = rnd.randint(xmin, xmax)
+        inner_xmax = rnd.randint(inner_xmin, xmax)
+        points |= rectangle_points(inner_xmin, rnd.randint(0, ymin), inner_xmax, rnd.randint(ymax, CELLS_COUNT - 1))
+    return points
+
+
+def make_maker(rnd, territory, enemy_territory, position):
+    enemy_position = rnd.choice(sorted(enemy_territory))
+    state = {
+        'tick_num': 1,
+        'bonuses': [],
+        'players': {
+            'i': {'territory': [to_pixels(*point) for point in territory], 'lines': [],
+                  'position': to_pixels(*position)},
+            '2': {'territory': [to_pixels(*point) for point in enemy_territory], 'lines': [],
+                  'position': to_pixels(*enemy_position)},
+        },
+    }
+    maker = RoutesMaker(GameSnapshot(CONFIG, state), 'left')
+    maker.prepare_estimation()
+    return maker
+
+
+def random_route(rnd, territory):
+    """
+    контур случайного прямоугольника вне территории, иногда с разрывом
+    returns клетки маршрута (x, y)
+    """
+    xmin, ymin, xmax, ymax = random_rectangle(rnd)
+    border = rectangle_points(xmin, ymin, xmax, ymax) - rectangle_points(xmin + 1, ymin + 1, xmax - 1, ymax - 1)
+    route = sorted(border - territory)
+    if route and rnd.random() < 0.2:
+        route.remove(rnd.choice(route))
+    return route
+
+
+def get_boxes(maker, route):
+    """
+    границы так же, как в RoutesMaker.add_route: прямоугольник маршрута со шлейфом
+    и область заливки, в которую входят ещё границы территории
+    returns (route_min_max, filling_min_max)
+    """
+    route_min_max = MinMax()
+    for x, y in route:
+        route_min_max.update(x, y)
+    lines_min_max = maker.lines_min_max
+    route_min_max.update(lines_min_max.xmin, lines_min_max.ymin)
+    route_min_max.update(lines_min_max.xmax, lines_min_max.ymax)
+
+    filling_min_max = MinMax()
+    filling_min_max.update(route_min_max.xmin, route_min_max.ymin)
+    filling_min_max.update(route_min_max.xmax, route_min_max.ymax)
+    filling_min_max.update(maker.min_max.xmin, maker.min_max.ymin)
+    filling_min_max.update(maker.min_max.xmax, maker.min_max.ymax)
+    return route_min_max, filling_min_max
+
+
+class FillingTestCase(unittest.TestCase):
+    def check_territories(self, cross, seed):
+        rnd = random.Random(seed)
+        closed_count = 0
+        for _ in range(CASES_COUNT):
+            territory = random_territory(rnd, cross)
+            enemy_territory = rectangle_points(*random_rectangle(rnd)) - territory
+            if not enemy_territory:
+                continue
+            for _ in range(5):
+                route = random_route(rnd, territory)
+                if not route:
+                    continue
+                # бот стоит на контуре, поэтому шлейф не расширяет прямоугольник маршрута
+                maker = make_maker(rnd, territory, enemy_territory, rnd.choice(route))
+                self.assertTrue(maker.snapshot.my_territory_info.is_convex)
+
+                route_board = maker.bitboards.from_cells([y * CELLS_COUNT + x for x, y in route])
+                route_min_max, filling_min_max = get_boxes(maker, route)
+                estimation = maker.filling_rectangle(route_min_max, maker.blocked, route_board,
+                                                     maker.get_filling_table())
+                if estimation is None:
+                    continue
+                closed_count += 1
+                # заливка по области с территорией проверяет, что вне прямоугольника карманов не остаётся
+                expected, = maker.filling_bfs([filling_min_max], [maker.blocked | route_board])
+                self.assertEqual(estimation, expected)
+
+        # большинство контуров замкнуты, иначе сравнивать было бы нечего
+        self.assertGreater(closed_count, CASES_COUNT)
+
+    def test_rectangular_territory(self):
+        self.check_territories(cross=False, seed=0)
+
+    def test_convex_territory(self):
+        self.check_territories(cross=True, seed=1)
+
+
+if __name__ == '__main__':
+    unittest.main()
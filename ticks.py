@@ -0,0 +1,277 @@
+"""
+дистанции во времени движка: тики вместо клеток
+
+игрок проходит клетку за width // speed тиков, с ускорением быстрее, с замедлением медленнее
+бонус на клетке меняет скорость со следующего шага, активный бонус действует ещё столько клеток,
+сколько прислано в его 'ticks', а подобранный по пути считается действующим до конца поля: меньше 10 клеток
+он не длится
+веса шагов - несколько целых чисел, поэтому вместо общей дейкстры идёт очередь по корзинам (Dial)
+"""
+
+from array import array
+
+from bfs import bfs
+from grid import Grid, UNVISITED, get_neighbor_table
+from metrics import metrics
+
+NITRO = 'n'
+SLOW = 's'
+
+# режимы скорости в состоянии поиска: активный бонус со сроком, обычная скорость, подобранные бонусы
+INITIAL, NORMAL, NITRO_MODE, SLOW_MODE = range(4)
+MODES_COUNT = 4
+BONUS_MODES = {NITRO: NITRO_MODE, SLOW: SLOW_MODE}
+# режимы от быстрого к медленному: ускорение со сроком между NITRO_MODE и NORMAL,
+# замедление со сроком на 2 дальше, между NORMAL и SLOW_MODE
+RANKS = {NITRO_MODE: 0, INITIAL: 1, NORMAL: 2, SLOW_MODE: 4}
+NO_RANK = 5
+
+
+def get_speeds(width, speed):
+    """
+    скорость с ускорением и с замедлением: ближайшие делители ширины клетки,
+    чтобы игрок по-прежнему попадал в центры клеток
+    """
+    divisors = [value for value in range(1, width + 1) if width % value == 0]
+    faster = min([value for value in divisors if value > speed], default=speed)
+    slower = max([value for value in divisors if value < speed], default=speed)
+    return faster, slower
+
+
+class Pace:
+    """
+    тики на клетку одного игрока
+    rates - по режимам: INITIAL - с активным бонусом, NORMAL, NITRO_MODE, SLOW_MODE
+    bonus_cells - сколько клеток ещё действует активный бонус, потом игрок идёт с обычной скоростью
+    """
+    __slots__ = ['rates', 'bonus_cells']
+
+    def __init__(self, width, speed, bonus_type=None, bonus_cells=0):
+        faster, slower = get_speeds(width, speed)
+        normal, nitro, slow = width // speed, width // faster, width // slower
+        rate = {NITRO: nitro, SLOW: slow}.get(bonus_type, normal)
+        if rate == normal:
+            bonus_cells = 0
+        self.rates = (rate, normal, nitro, slow)
+        self.bonus_cells = bonus_cells
+
+    @property
+    def normal(self):
+        return self.rates[NORMAL]
+
+    @property
+    def rate(self):
+        """
+        тики на следующую клетку
+        """
+        return self.rates[INITIAL] if self.bonus_cells else self.rates[NORMAL]
+
+    def walk(self, path, bonuses):
+        """
+        тики на путь path (клетки без стартовой), bonuses - клетка -> тип бонуса
+        """
+        mode, ticks = INITIAL if self.bonus_cells else NORMAL, 0
+        for step, cell in enumerate(path):
+            ticks += self.rates[mode]
+            if mode == INITIAL and step + 1 >= self.bonus_cells:
+                mode = NORMAL
+            mode = BONUS_MODES.get(bonuses.get(cell), mode)
+        return ticks
+
+    def __eq__(self, other):
+        return isinstance(other, Pace) and self.rates == other.rates and self.bonus_cells == other.bonus_cells
+
+    def __hash__(self):
+        return hash((self.rates, self.bonus_cells))
+
+
+class TickResult:
+    """
+    dist - Grid тиков до каждой клетки, минимум по всем меткам (UNVISITED для непосещённых)
+    reached - метка -> тики до первой своей целевой клетки, метки без пути в результат не попадают
+    """
+    __slots__ = ['dist', 'reached']
+
+    def __init__(self, dist, reached):
+        self.dist = dist
+        self.reached = reached
+
+    def distance(self, cell):
+        """
+        returns None if cell was not visited
+        """
+        value = self.dist.cells[cell]
+        return None if value == UNVISITED else value
+
+
+def uniform_search(x_cells_count, y_cells_count, sources, max_ticks, deadline):
+    """
+    tick_search без бонусов, препятствий и целей: у всех меток одни и те же тики на клетку
+    """
+    rate = next(iter(sources.values()))[1].normal
+    source_cells = [cell for cells, _ in sources.values() for cell in cells]
+    result = bfs(x_cells_count, y_cells_count, source_cells, max_depth=max_ticks // rate, deadline=deadline)
+    dist = Grid(x_cells_count, y_cells_count)
+    dist.cells[:] = array('h', [UNVISITED if distance == UNVISITED else distance * rate
+                                for distance in result.dist.cells])
+    return TickResult(dist, {})
+
+
+def tick_search(x_cells_count, y_cells_count, sources, bonuses=None, blocked=None, targets=None, max_ticks=None,
+                first_target=False, deadline=None):
+    """
+    поиск по времени сразу от нескольких игроков: у каждой метки свои скорость, препятствия и цели,
+    а все метки идут в одной очереди по корзинам тиков
+    раскрытые состояния считаются в metrics как bfs_expanded
+
+    sources - метка -> (клетки, Pace), клетки метки стартуют в тик 0
+    bonuses - клетка -> тип бонуса на карте
+    blocked, targets - метка -> Mask; у метки без записи нет препятствий или целей
+    источник, который сам лежит в целях своей метки, даёт 0 тиков
+    если целей нет, поиск идёт по всей карте, иначе до тех пор, пока каждая метка с целями не дойдёт до своей
+    first_target - остановиться, как только хоть одна метка дошла до цели
+    max_ticks - не посещать клетки позже этого тика
+    deadline - Deadline, проверяется на каждой новой корзине, raises DeadlineExceeded
+    """
+    size = x_cells_count * y_cells_count
+    bonuses = bonuses or {}
+    blocked = blocked or {}
+    targets = targets or {}
+    labels = list(sources)
+    paces = [sources[label][1] for label in labels]
+    empty = bytes(size)
+    blocked_cells = [blocked[label].cells if label in blocked else empty for label in labels]
+    target_cells = [targets[label].cells if label in targets else None for label in labels]
+    if max_ticks is None:
+        max_ticks = UNVISITED - 1
+
+    if labels and not bonuses and not blocked and not targets and not any(pace.bonus_cells for pace in paces):
+        # все идут с обычной скоростью: это обычный bfs, умноженный на тики на клетку
+        return uniform_search(x_cells_count, y_cells_count, sources, max_ticks, deadline)
+
+    # клетка -> режим после бонуса на ней, 0 - бонуса нет
+    bonus_modes = bytearray(size)
+    for cell, bonus_type in bonuses.items():
+        bonus_modes[cell] = BONUS_MODES[bonus_type]
+
+    # состояние - (метка, режим, клетка) одним числом; для INITIAL ещё хранится число шагов
+    ticks = array('h', [UNVISITED]) * (size * MODES_COUNT * len(labels))
+    initial_steps = array('h', [0]) * (size * len(labels))
+    # режим, не медленнее которого метка уже раскрыла клетку: позже прийти в режиме не быстрее бесполезно
+    best_ranks = bytearray([NO_RANK]) * (size * len(labels))
+    label_ranks = [tuple(RANKS[mode] if mode != INITIAL or pace.rates[INITIAL] < pace.rates[NORMAL]
+                         else RANKS[mode] + 2 for mode in range(MODES_COUNT)) for pace in paces]
+    dist = Grid(x_cells_count, y_cells_count)
+    cells = dist.cells
+
+    # корзина tick % len(buckets) хранит состояния с этим числом тиков: (номер метки, режим) -> клетки
+    max_rate = max([max(pace.rates) for pace in paces], default=1)
+    buckets = [{} for _ in range(max_rate + 1)]
+
+    is_reached = [False] * len(labels)
+    waiting = sum(1 for cells_mask in target_cells if cells_mask is not None)
+    if first_target:
+        waiting = min(waiting, 1)
+    for number, label in enumerate(labels):
+        source_cells, pace = sources[label]
+        mode = INITIAL if pace.bonus_cells else NORMAL
+        for index in source_cells:
+            if target_cells[number] is not None and target_cells[number][index] and not is_reached[number]:
+                is_reached[number] = True
+                waiting -= 1
+            state = (number * MODES_COUNT + mode) * size + index
+            if ticks[state] == UNVISITED:
+                ticks[state] = 0
+                buckets[0].setdefault((number, mode), []).append(index)
+    reached = {label: 0 for number, label in enumerate(labels) if is_reached[number]}
+
+    neighbor_table = get_neighbor_table(x_cells_count, y_cells_count)
+
+    expanded = 0
+    tick = 0
+    # сколько корзин подряд оказались пустыми: когда пусты все, очередь кончилась
+    empty_buckets = 0
+    while empty_buckets < len(buckets) and (waiting > 0 or not targets) and tick <= max_ticks:
+        bucket = buckets[tick % len(buckets)]
+        if not bucket:
+            empty_buckets += 1
+            tick += 1
+            if deadline is not None:
+                deadline.check()
+            continue
+        empty_buckets = 0
+
+        for (number, mode), group in list(bucket.items()):
+            if not group or is_reached[number]:
+                continue
+
+            pace = paces[number]
+            rank = label_ranks[number][mode]
+            ranks = label_ranks[number]
+            state_offset = (number * MODES_COUNT + mode) * size
+            label_start = number * size
+            label_offset = number * MODES_COUNT
+            label_blocked, label_targets = blocked_cells[number], target_cells[number]
+            next_tick = tick + pace.rates[mode]
+            next_bucket = buckets[next_tick % len(buckets)]
+            expand = next_tick <= max_ticks
+            next_mode = mode
+            next_group = next_bucket.setdefault((number, mode), []) if mode != INITIAL else None
+
+            for index in group:
+                if ticks[state_offset + index] != tick:
+                    # к состоянию уже нашёлся путь быстрее
+                    continue
+                label_cell = label_start + index
+                if best_ranks[label_cell] <= rank:
+                    continue
+                best_ranks[label_cell] = rank
+
+                expanded += 1
+                if cells[index] == UNVISITED:
+                    cells[index] = tick
+
+                if label_targets is not None and label_targets[index]:
+                    is_reached[number] = True
+                    reached[labels[number]] = tick
+                    waiting -= 1
+                    break
+
+                if not expand:
+                    continue
+
+                steps = 0
+                if mode == INITIAL:
+                    steps = initial_steps[label_cell] + 1
+                    next_mode = NORMAL if steps >= pace.bonus_cells else INITIAL
+                    next_group = next_bucket.setdefault((number, next_mode), [])
+
+                next_offset = (label_offset + next_mode) * size
+                for neighbor in neighbor_table[index]:
+                    if label_blocked[neighbor]:
+                        continue
+
+                    neighbor_mode = bonus_modes[neighbor]
+                    if neighbor_mode:
+                        neighbor_state = (label_offset + neighbor_mode) * size + neighbor
+                        if ticks[neighbor_state] <= next_tick or best_ranks[label_start + neighbor] <= ranks[neighbor_mode]:
+                            continue
+                        ticks[neighbor_state] = next_tick
+                        next_bucket.setdefault((number, neighbor_mode), []).append(neighbor)
+                        continue
+
+                    neighbor_state = next_offset + neighbor
+                    if ticks[neighbor_state] <= next_tick or best_ranks[label_start + neighbor] <= ranks[next_mode]:
+                        continue
+                    ticks[neighbor_state] = next_tick
+                    if next_mode == INITIAL:
+                        initial_steps[label_start + neighbor] = steps
+                    next_group.append(neighbor)
+
+        bucket.clear()
+        tick += 1
+        if deadline is not None:
+            deadline.check()
+
+    metrics.count('bfs_expanded', expanded)
+    return TickResult(dist, reached)
@@ -0,0 +1,209 @@
+"""
+турнир локальных партий на всех ядрах
+
+участник задаётся как NAME=SPEC:
+    cur=bot                               - Bot из этого дерева
+    budget=bot:{"tick_budget": 0.05}      - Bot из этого дерева с аргументами конструктора
+    old=/path/to/other/checkout           - другая версия, запускается через её main.py по протоколу
+
+    python tournament.py --bot cur=bot --bot old=../baseline --players 4 --games 200
+"""
+
+import argparse
+import json
+import math
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from snapshot import MAX_TICK_COUNT
+
+
+class ProcessBot:
+    """
+    бот другой версии в отдельном процессе, общение построчным json как с сервером
+    """
+    def __init__(self, path):
+        self.path = path
+        self.process = None
+
+    def on_game_start(self, config):
+        self.process = subprocess.Popen([sys.executable, '-u', 'main.py'], cwd=self.path, text=True,
+                                        stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        self.send({'type': 'start_game', 'params': config})
+
+    def on_tick(self, state):
+        self.send({'type': 'tick', 'params': state})
+        return json.loads(self.process.stdout.readline())['command']
+
+    def send(self, message):
+        self.process.stdin.write(json.dumps(message) + '\n')
+        self.process.stdin.flush()
+
+    def close(self):
+        if self.process is not None and self.process.poll() is None:
+            try:
+                self.send({'type': 'end_game', 'params': {}})
+            except BrokenPipeError:
+                pass
+            self.process.wait()
+
+
+def parse_bot_spec(text):
+    """
+    NAME=SPEC -> (name, spec), см. описание модуля
+    """
+    name, _, spec = text.partition('=')
+    if not spec:
+        raise argparse.ArgumentTypeError(f'expected NAME=SPEC, got {text!r}')
+    if spec != 'bot' and not spec.startswith('bot:') and not os.path.isdir(spec):
+        raise argparse.ArgumentTypeError(f'{spec!r} is neither bot[:kwargs] nor a directory')
+    return name, spec
+
+
+def create_bot(spec):
+    if spec == 'bot' or spec.startswith('bot:'):
+        from algo import Bot
+        kwargs = json.loads(spec[len('bot:'):]) if spec.startswith('bot:') else {}
+        return Bot(**kwargs)
+    return ProcessBot(os.path.abspath(spec))
+
+
+def play_match(seed, lineup, max_tick):
+    """
+    lineup - [(name, spec)] по местам, выполняется в процессе пула
+    returns [(name, place, score, alive, latencies)] по местам
+    """
+    from simulator import Game
+
+    bots = [create_bot(spec) for _, spec in lineup]
+    try:
+        result = Game(bots, seed=seed, max_tick=max_tick).play()
+    finally:
+        for bot in bots:
+            if isinstance(bot, ProcessBot):
+                bot.close()
+
+    ranking = result.ranking()
+    return [(name, ranking.index(player_id) + 1, score, alive, result.latencies[player_id])
+            for (name, _), (player_id, score, alive) in zip(lineup, result.players)]
+
+
+def make_lineups(bots, players, games):
+    """
+    участники по кругу сдвигаются на одно место каждую партию,
+    поэтому каждый одинаково часто играет с каждого стартового места
+    """
+    return [[bots[(game + slot) % len(bots)] for slot in range(players)] for game in range(games)]
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def wilson_interval(wins, games, z=1.96):
+    """
+    95% доверительный интервал доли побед
+    """
+    if games == 0:
+        return 0.0, 0.0
+    share = wins / games
+    denominator = 1 + z * z / games
+    center = (share + z * z / (2 * games)) / denominator
+    spread = z * math.sqrt(share * (1 - share) / games + z * z / (4 * games * games)) / denominator
+    return center - spread, center + spread
+
+
+def summarize(matches):
+    """
+    matches - результаты play_match
+    returns name -> сводка по участнику
+    """
+    stats = {}
+    for match in matches:
+        for name, place, score, alive, latencies in match:
+            entry = stats.setdefault(name, {'games': 0, 'wins': 0, 'places': 0, 'scores': 0, 'survived': 0,
+                                            'latencies': []})
+            entry['games'] += 1
+            entry['wins'] += place == 1
+            entry['places'] += place
+            entry['scores'] += score
+            entry['survived'] += alive
+            entry['latencies'].extend(latencies)
+
+    summary = {}
+    for name, entry in stats.items():
+        games = entry['games']
+        latencies = sorted(entry['latencies'])
+        low, high = wilson_interval(entry['wins'], games)
+        summary[name] = {
+            'games': games,
+            'win_rate': entry['wins'] / games,
+            'win_rate_95': [low, high],
+            'mean_place': entry['places'] / games,
+            'mean_score': entry['scores'] / games,
+            'survival_rate': entry['survived'] / games,
+            'ticks': len(latencies),
+            'latency_ms': {
+                'mean': 1000 * sum(latencies) / len(latencies) if latencies else 0.0,
+                'p50': 1000 * percentile(latencies, 0.5),
+                'p95': 1000 * percentile(latencies, 0.95),
+                'p99': 1000 * percentile(latencies, 0.99),
+                'max': 1000 * latencies[-1] if latencies else 0.0,
+            },
+        }
+    return summary
+
+
+def run_tournament(bots, players, games, seed=0, max_tick=MAX_TICK_COUNT, workers=None):
+    lineups = make_lineups(bots, players, games)
+    matches = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(play_match, seed + game, lineup, max_tick) for game, lineup in enumerate(lineups)]
+        for done, future in enumerate(as_completed(futures), 1):
+            matches.append(future.result())
+            print(f'\r{done}/{games} games', end='', file=sys.stderr, flush=True)
+    print(file=sys.stderr)
+    return summarize(matches)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='турнир локальных партий на всех ядрах')
+    parser.add_argument('--bot', type=parse_bot_spec, action='append', required=True,
+                        help='NAME=SPEC, можно указать несколько раз')
+    parser.add_argument('--players', type=int, default=4, help='ботов в партии, от 2 до 6')
+    parser.add_argument('--games', type=int, default=100)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--max-tick', type=int, default=MAX_TICK_COUNT)
+    parser.add_argument('--workers', type=int, default=None, help='по умолчанию все ядра')
+    parser.add_argument('--output', help='записать сводку в json')
+    args = parser.parse_args()
+
+    if not 2 <= args.players <= 6:
+        parser.error('--players must be between 2 and 6')
+
+    start_time = time.perf_counter()
+    summary = run_tournament(args.bot, args.players, args.games, args.seed, args.max_tick, args.workers)
+    elapsed = time.perf_counter() - start_time
+
+    print(f'{args.games} games in {elapsed:.1f}s')
+    for name, entry in sorted(summary.items(), key=lambda item: -item[1]['win_rate']):
+        low, high = entry['win_rate_95']
+        latency = entry['latency_ms']
+        print(f'{name:>12}: win {100 * entry["win_rate"]:5.1f}% [{100 * low:.1f}..{100 * high:.1f}] '
+              f'place {entry["mean_place"]:.2f} score {entry["mean_score"]:7.1f} '
+              f'survived {100 * entry["survival_rate"]:5.1f}% '
+              f'tick p50 {latency["p50"]:.1f} p99 {latency["p99"]:.1f} max {latency["max"]:.1f} ms')
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump({'games': args.games, 'players': args.players, 'seed': args.seed,
+                       'elapsed': elapsed, 'bots': summary}, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
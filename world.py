@@ -0,0 +1,143 @@
+"""
+модель мира, которая живёт между тиками
+
+территория меняется только при захвате, поэтому всё, что из неё выводится (маски, доски,
+граница, координаты для перебора маршрутов), переносится с прошлого тика, пока множество клеток то же самое
+шлейф за тик прирастает на клетку и пересчитывается в снимке каждый тик: он короткий
+"""
+
+from functools import cached_property
+
+from bitboard import get_bitboards
+from distance_fields import DistanceFields
+from grid import Mask
+from metrics import metrics
+
+
+class TerritoryInfo:
+    """
+    клетки территории и то, что из них выводится; всё считается при первом обращении
+    объект общий для нескольких тиков, поэтому его поля только читаются
+    """
+    def __init__(self, cells, x_cells_count, y_cells_count):
+        self.cells = cells
+        self.x_cells_count = x_cells_count
+        self.y_cells_count = y_cells_count
+
+    @cached_property
+    def mask(self):
+        return Mask(self.x_cells_count, self.y_cells_count, self.cells)
+
+    @cached_property
+    def board(self):
+        return get_bitboards(self.x_cells_count, self.y_cells_count).from_mask(self.mask)
+
+    @cached_property
+    def x_set(self):
+        return {cell % self.x_cells_count for cell in self.cells}
+
+    @cached_property
+    def y_set(self):
+        return {cell // self.x_cells_count for cell in self.cells}
+
+    @cached_property
+    def cross(self):
+        """
+        клетки, которые лежат в одном столбце или одной строке хотя бы с одной клеткой территории
+        """
+        x_set, y_set = self.x_set, self.y_set
+        return frozenset(y * self.x_cells_count + x for y in range(self.y_cells_count) for x in range(self.x_cells_count)
+                         if x in x_set or y in y_set)
+
+    @cached_property
+    def bounds(self):
+        """
+        (xmin, ymin, xmax, ymax), у пустой территории бесконечности как у пустого MinMax
+        """
+        if not self.cells:
+            return float('inf'), float('inf'), float('-inf'), float('-inf')
+        return min(self.x_set), min(self.y_set), max(self.x_set), max(self.y_set)
+
+    @cached_property
+    def borders(self):
+        """
+        клетки, соседние с территорией, но не входящие в неё
+        """
+        bitboards = get_bitboards(self.x_cells_count, self.y_cells_count)
+        return set(bitboards.to_cells(bitboards.neighbors(self.board)))
+
+    @cached_property
+    def is_convex(self):
+        return get_bitboards(self.x_cells_count, self.y_cells_count).is_orthogonally_convex(self.board)
+
+
+class WorldModel:
+    """
+    живёт в Bot всю игру, GameSnapshot берёт из неё территории и bfs-поля
+    """
+    def __init__(self, x_cells_count, y_cells_count):
+        self.x_cells_count = x_cells_count
+        self.y_cells_count = y_cells_count
+        # id игрока -> TerritoryInfo последнего тика, в котором игрок был
+        self.territories = {}
+        # TerritoryInfo врагов, из которых собрано объединение, и само объединение
+        self.enemy_parts = ()
+        self.enemy_territory = None
+        self.fields = DistanceFields(x_cells_count, y_cells_count)
+        # имя -> (ключ, значение), посчитанное заранее для этого тика, см. precompute.py
+        self.speculations = {}
+        # (TerritoryInfo моя, TerritoryInfo врагов, SummedAreaTable очков за клетку), см. TerritoryMovementsMap
+        self.region_values = (None, None, None)
+
+    def next_tick(self, player_ids):
+        """
+        вызывается снимком нового тика до любых обращений к территориям и полям
+        """
+        for player_id in list(self.territories):
+            if player_id not in player_ids:
+                del self.territories[player_id]
+        self.fields.next_tick()
+        self.speculations = {}
+
+    def put_speculation(self, name, key, value):
+        """
+        value годится для тика, входные данные которого равны key; живёт до следующего next_tick
+        """
+        self.speculations[name] = (key, value)
+
+    def get_speculation(self, name, key):
+        """
+        returns value, если заранее посчитанное было для тех же входных данных, иначе None
+        """
+        speculation = self.speculations.get(name)
+        if speculation is None:
+            return None
+        if speculation[0] != key:
+            metrics.count('speculation_misses')
+            return None
+        metrics.count('speculation_hits')
+        return speculation[1]
+
+    def get_territory(self, player_id, cells):
+        """
+        returns TerritoryInfo прошлого тика, если клетки те же, иначе новый
+        """
+        info = self.territories.get(player_id)
+        if info is None or info.cells != cells:
+            info = self.get_speculation(('territory', player_id), cells) or \
+                TerritoryInfo(cells, self.x_cells_count, self.y_cells_count)
+            self.territories[player_id] = info
+        return info
+
+    def get_enemy_territory(self, parts):
+        """
+        parts - TerritoryInfo врагов из get_territory
+        объединение собирается заново, только если территория хоть одного врага поменялась
+        """
+        parts = tuple(parts)
+        if self.enemy_territory is None or len(parts) != len(self.enemy_parts) or \
+                any(part is not previous for part, previous in zip(parts, self.enemy_parts)):
+            cells = frozenset().union(*(part.cells for part in parts))
+            self.enemy_parts = parts
+            self.enemy_territory = TerritoryInfo(cells, self.x_cells_count, self.y_cells_count)
+        return self.enemy_territory